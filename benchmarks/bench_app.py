@@ -0,0 +1,224 @@
+"""
+Headless benchmark of streamlit_app.py as history grows: storage and badge
+hot paths plus full script reruns through Streamlit's AppTest, with latency
+and peak Python memory per operation, written as JSON for run-to-run
+comparison.
+
+    python benchmarks/bench_app.py --sizes 10,1000,100000 --json results.json
+    python benchmarks/bench_app.py --baseline results.json   # exits 1 on regressions
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import pandas as pd
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from shopimpact.impact import ImpactAggregates, evaluate_badges, score_purchase
+from shopimpact.storage import DEFAULT_USER, open_storage
+from shopimpact.write_behind import WriteBehindStore
+from synthetic import populate
+
+APP = ROOT / "streamlit_app.py"
+DEFAULT_SIZES = (10, 1_000, 100_000)  # add 1000000 explicitly; it takes minutes
+ANALYTICS_TAB = "📊 Analytics"
+DASHBOARD_TAB = "🛍️ Dashboard"
+# One app run in a fresh interpreter; the app reports its first_paint phase through the metrics file.
+FIRST_PAINT_CHILD = (
+    "import sys; from streamlit.testing.v1 import AppTest; "
+    "at = AppTest.from_file(sys.argv[1], default_timeout=float(sys.argv[2])); at.run(); "
+    "sys.exit(1 if at.exception else 0)"
+)
+
+def measure(fn: Callable, repeat: int, setup: Optional[Callable] = None) -> Dict:
+    """
+    Median latency over `repeat` runs, then one extra run under tracemalloc
+    for peak memory. `setup` runs untimed before every run, including the
+    traced one.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    if setup:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'ms': statistics.median(times) * 1000, 'peak_bytes': peak}
+
+def sample_purchase() -> Dict:
+    return {'date': '2025-01-01 12:00', 'type': 'Laptop', 'brand': 'Dell',
+            'price': 45000.0, 'co2_impact': score_purchase('Laptop', 45000)}
+
+def bench_storage(backend: str, workdir: Path, size: int, repeat: int) -> Dict:
+    """What the app's storage wrappers do: load_data_cached misses, save_data, journal_purchase, check_badges."""
+    store = open_storage(backend, workdir / "shopimpact_data", workdir / "shopimpact.db")
+    populate(store, size)
+    data = store.load(DEFAULT_USER)
+    aggs = ImpactAggregates(data['aggregates'])
+    purchase = sample_purchase()
+
+    def load():
+        # A fresh store, as after a restart: nothing warm but the OS page cache.
+        fresh = open_storage(backend, workdir / "shopimpact_data", workdir / "shopimpact.db")
+        fresh.load(DEFAULT_USER)
+        fresh.close()
+
+    ops = {
+        'load_data': measure(load, repeat),
+        'save_data': measure(lambda: store.save(data, DEFAULT_USER), repeat),
+        'append_purchase': measure(lambda: store.append_purchase(purchase, DEFAULT_USER), repeat * 4),
+        'check_badges': measure(lambda: evaluate_badges(aggs, purchase, []), repeat * 20),
+    }
+    # What a submit waits on with the app's write-behind store: queueing, not the fsync.
+    behind = WriteBehindStore(store)
+    ops['append_purchase_write_behind'] = measure(lambda: behind.append_purchase(purchase, DEFAULT_USER), repeat * 4)
+    behind.close()  # flushes the queue, then closes `store`
+    # Leave exactly `size` purchases behind for the app runs.
+    store = open_storage(backend, workdir / "shopimpact_data", workdir / "shopimpact.db")
+    populate(store, size)
+    store.close()
+    return ops
+
+def bench_app(timeout: float, repeat: int) -> Dict:
+    """Full script runs of the real app against the data bench_storage left behind."""
+    app = {}
+
+    def new_session():
+        # A new browser session in a fresh process: nothing cached.
+        st.cache_data.clear()
+        st.cache_resource.clear()
+        app['at'] = AppTest.from_file(str(APP), default_timeout=timeout)
+
+    def run(tab: str = DASHBOARD_TAB):
+        at = app['at']
+        at.session_state['active_tab'] = tab
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+
+    def add():
+        at = app['at']
+        at.session_state['active_tab'] = DASHBOARD_TAB
+        next(b for b in at.button if 'Add to Tracker' in str(b.label)).click().run()
+
+    ops = {'rerun_cold': measure(run, repeat, setup=new_session)}
+    ops['rerun_dashboard'] = measure(run, repeat)
+    ops['add_purchase'] = measure(add, repeat)
+    # Dropping cached figures makes every Analytics run build them.
+    ops['rerun_analytics_cold'] = measure(lambda: run(ANALYTICS_TAB), repeat, setup=st.cache_resource.clear)
+    ops['rerun_analytics_warm'] = measure(lambda: run(ANALYTICS_TAB), repeat)
+    st.cache_resource.clear()
+    return ops
+
+def bench_first_paint(workdir: Path, timeout: float, repeat: int) -> Dict:
+    """
+    Time to first paint of a new session in a cold process: from the start of
+    the script, imports included, until the header has been sent. Memory is
+    not traced across processes.
+    """
+    metrics = workdir / "first_paint.json"
+    env = dict(os.environ, SHOPIMPACT_METRICS_FILE=str(metrics))
+    times = []
+    for _ in range(repeat):
+        subprocess.run([sys.executable, "-c", FIRST_PAINT_CHILD, str(APP), str(timeout)],
+                       env=env, check=True, timeout=timeout, capture_output=True)
+        times.append(json.loads(metrics.read_text())['phases']['first_paint']['sum'])
+    return {'ms': statistics.median(times) * 1000, 'peak_bytes': None}
+
+def run_suite(sizes: List[int], backend: str, repeat: int, timeout: float) -> Dict:
+    results = []
+    cwd = os.getcwd()
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix="shopimpact-bench-") as tmp:
+            workdir = Path(tmp)
+            os.environ.update({
+                'SHOPIMPACT_STORAGE': backend,
+                'SHOPIMPACT_DATA_DIR': str(workdir / "shopimpact_data"),
+                'SHOPIMPACT_DB': str(workdir / "shopimpact.db"),
+            })
+            os.chdir(workdir)  # the legacy data file is resolved relative to the working directory
+            try:
+                ops = bench_storage(backend, workdir, size, repeat)
+                ops['first_paint_cold'] = bench_first_paint(workdir, timeout, repeat)
+                ops.update(bench_app(timeout, repeat))
+            finally:
+                os.chdir(cwd)
+        results.append({'size': size, 'ops': ops})
+        print_size(size, ops)
+    return {
+        'meta': {
+            'backend': backend,
+            'repeat': repeat,
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'streamlit': st.__version__,
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+        },
+        'results': results,
+    }
+
+def print_size(size: int, ops: Dict) -> None:
+    print(f"{size:,} purchases")
+    for name, r in ops.items():
+        peak = f"{r['peak_bytes'] / 1e6:9.1f} MB peak" if r['peak_bytes'] is not None else ""
+        print(f"  {name:<22} {r['ms']:10.2f} ms  {peak}")
+
+def compare(current: Dict, baseline: Dict, tolerance: float, floor_ms: float = 1.0) -> List[str]:
+    """Operations that got slower than `baseline` by more than `tolerance` (and by more than `floor_ms`)."""
+    before = {(r['size'], op): v['ms'] for r in baseline['results'] for op, v in r['ops'].items()}
+    regressions = []
+    for r in current['results']:
+        for op, v in r['ops'].items():
+            old = before.get((r['size'], op))
+            if old is not None and v['ms'] > old * (1 + tolerance) and v['ms'] - old > floor_ms:
+                regressions.append(f"{op} @ {r['size']:,}: {old:.1f} ms -> {v['ms']:.1f} ms ({v['ms'] / old:.2f}x)")
+    return regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated history sizes (default: %(default)s)")
+    parser.add_argument('--backend', choices=['json', 'sqlite'], default='json')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=600, help="Seconds allowed per app run")
+    parser.add_argument('--json', type=Path, help="Write results to this file")
+    parser.add_argument('--baseline', type=Path, help="Compare against an earlier --json file")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    result = run_suite([int(s) for s in args.sizes.split(',')], args.backend, args.repeat, args.timeout)
+    if args.json:
+        args.json.write_text(json.dumps(result, indent=2))
+    if args.baseline:
+        regressions = compare(result, json.loads(args.baseline.read_text()), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
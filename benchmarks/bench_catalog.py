@@ -0,0 +1,74 @@
+"""
+Typeahead latency of the catalog index: build time and top-k search for
+prefix, word-prefix and substring queries over a synthetic catalog.
+
+    python benchmarks/bench_catalog.py --products 50000 --brands 20000
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from shopimpact.catalog import CatalogIndex
+
+ADJECTIVES = ('Eco', 'Bamboo', 'Organic', 'Steel', 'Cotton', 'Recycled', 'Smart', 'Mini', 'Pro', 'Ultra',
+              'Classic', 'Vintage', 'Solar', 'Wool', 'Linen', 'Glass')
+NOUNS = ('Bottle', 'Toothbrush', 'Jacket', 'Lamp', 'Charger', 'Backpack', 'Mug', 'Sneaker', 'Blender',
+         'Kettle', 'Tote', 'Notebook', 'Speaker', 'Rug')
+QUERIES = {'prefix': 'bam', 'word_prefix': 'toothbr', 'two_words': 'glass kett', 'substring': 'rush 12',
+           'no_match': 'zzzz'}
+
+def build(products: int, brands: int, seed: int = 7) -> CatalogIndex:
+    rng = np.random.default_rng(seed)
+    index = CatalogIndex()
+    for i, (a, b, n) in enumerate(zip(rng.choice(ADJECTIVES, products), rng.choice(ADJECTIVES, products),
+                                      rng.choice(NOUNS, products))):
+        index.add('product', f"{a} {b} {n} {i}", f"{rng.uniform(0.05, 5):.2f}")
+    for i, a in enumerate(rng.choice(ADJECTIVES, brands)):
+        index.add('brand', f"{a}works {i}")
+    return index.build()
+
+def timeit(fn, repeat: int = 200) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+def run(products: int, brands: int) -> dict:
+    t0 = time.perf_counter()
+    index = build(products, brands)
+    built = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    index.build_grams()
+    grams = time.perf_counter() - t0
+    return {
+        'entries': len(index),
+        'build_s': built,
+        'build_grams_s': grams,
+        'search_ms': {name: timeit(lambda q=q: index.search(q, 'product')) for name, q in QUERIES.items()},
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--products', type=int, default=50_000)
+    parser.add_argument('--brands', type=int, default=20_000)
+    parser.add_argument('--json', type=Path, help="Also write results to this file")
+    args = parser.parse_args()
+
+    result = run(args.products, args.brands)
+    print(f"{result['entries']:,} entries: index {result['build_s']:.2f} s, trigrams {result['build_grams_s']:.2f} s")
+    for name, ms in result['search_ms'].items():
+        print(f"  {name:<12} {ms:8.3f} ms")
+    if args.json:
+        args.json.write_text(json.dumps(result, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Compare the columnar PurchaseColumns store against the list-of-dicts it
+replaces: resident memory and the latency of the operations a rerun does.
+
+    python benchmarks/bench_purchase_store.py --size 100000
+"""
+
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd
+
+from shopimpact.purchase_store import PurchaseColumns
+from synthetic import generate_records
+
+def make_records(n: int, seed: int = 7) -> list:
+    # Round-trip through JSON so strings are distinct objects, as after load_data.
+    return json.loads(json.dumps(generate_records(n, seed)))
+
+def measure_memory(build) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current
+
+def timeit(fn, repeat: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+def month_totals_scan(df: pd.DataFrame) -> tuple:
+    month = df[(df['date_dt'] >= '2024-06-01') & (df['date_dt'] < '2024-07-01')]
+    return month['price'].sum(), month['co2_impact'].sum()
+
+def run(size: int) -> dict:
+    raw = json.dumps(make_records(size))
+    records, list_bytes = measure_memory(lambda: json.loads(raw))
+    cols, cols_bytes = measure_memory(lambda: PurchaseColumns.from_records(records))
+
+    def dicts_frame():
+        df = pd.DataFrame(records)
+        df['date_dt'] = pd.to_datetime(df['date'])
+        return df
+
+    extra = make_records(1000, seed=11)
+
+    def dicts_append():
+        target = list(records[:0])
+        for r in extra:
+            target.append(r)
+
+    def cols_append():
+        target = PurchaseColumns()
+        for r in extra:
+            target.append(r)
+
+    return {
+        'size': size,
+        'memory_bytes': {'list_of_dicts': list_bytes, 'columns': cols_bytes},
+        'latency_ms': {
+            'build_columns_from_records': timeit(lambda: PurchaseColumns.from_records(records), repeat=3),
+            'dataframe_list_of_dicts': timeit(dicts_frame),
+            'dataframe_columns': timeit(cols.to_frame),
+            'append_1k_list_of_dicts': timeit(dicts_append),
+            'append_1k_columns': timeit(cols_append),
+            'tail_5_list_of_dicts': timeit(lambda: pd.DataFrame(records).tail(5)),
+            'tail_5_columns': timeit(lambda: cols[-5:].to_frame()),
+            # One month of totals: the full scan the README's date filter used to need vs a binary search.
+            'month_totals_list_of_dicts': timeit(lambda: month_totals_scan(dicts_frame())),
+            'month_totals_columns': timeit(lambda: cols.between('2024-06-01', '2024-07-01').aggregates()),
+            # One purchase-log page deep in the history: a slice by date, a gather once the price order is cached.
+            'log_page_by_date': timeit(lambda: cols.page(len(cols) // 100, 50)),
+            'log_page_by_price': timeit(lambda: cols.page(len(cols) // 100, 50, 'price')),
+        },
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', type=int, default=100_000)
+    parser.add_argument('--json', type=Path, help="Also write results to this file")
+    args = parser.parse_args()
+
+    result = run(args.size)
+    mem = result['memory_bytes']
+    print(f"{args.size:,} purchases")
+    print(f"  memory  list-of-dicts {mem['list_of_dicts'] / 1e6:8.1f} MB")
+    print(f"          columns       {mem['columns'] / 1e6:8.1f} MB  "
+          f"({mem['list_of_dicts'] / max(mem['columns'], 1):.0f}x smaller)")
+    for name, ms in result['latency_ms'].items():
+        print(f"  {name:<30} {ms:10.2f} ms")
+    if args.json:
+        args.json.write_text(json.dumps(result, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Synthetic purchase histories for benchmarks: catalog types and brands with
+everyday items far more common than big-ticket ones, log-normal prices per
+kind of product and timestamps spread over a few years of shopping hours.
+
+    python benchmarks/synthetic.py --size 100000 --out history.csv
+"""
+
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+
+from shopimpact.impact import ALL_BRANDS, PRODUCT_TYPES, score_batch
+from shopimpact.storage import DEFAULT_USER, StorageBackend, get_default_data
+
+# (relative frequency, median price ₹) per group of product types; anything unlisted is 'other'.
+PROFILES = {
+    'everyday': (12.0, 300, ['Local Groceries', 'Organic Vegetables', 'Organic Fruits', 'Meat', 'Dairy Products',
+                             'Snacks', 'Coffee', 'Dessert', 'Fast Food', 'Restaurant Meal', 'Personal Care',
+                             'Stationery', 'Socks', 'E-book', 'Digital Download']),
+    'clothing': (4.0, 1500, ['Fast Fashion', 'T-Shirt', 'Jeans', 'Dress', 'Sweater', 'Hoodie', 'Shorts', 'Skirt',
+                             'Pants', 'Leggings', 'Activewear', 'Swimwear', 'Underwear', 'Shoes', 'Sneakers',
+                             'Thrifted Clothing', 'Second-Hand Item', 'Books (New)', 'Books (Used)', 'Cosmetics',
+                             'Skincare', 'Hair Care']),
+    'big_ticket': (0.3, 30000, ['Laptop', 'Smartphone', 'Desktop Computer', 'TV', 'Sofa', 'Bed', 'Mattress',
+                                'Appliance', 'Bicycle', 'Gaming Console', 'Camera', 'Drone', 'Refurbished Tech',
+                                'Used Electronics', 'Vintage Furniture', 'Tires']),
+    'other': (1.0, 3000, []),
+}
+PRICE_SPREAD = 0.8  # sigma of log(price)
+
+def _type_profile():
+    group_of = {t: g for g, (_, _, types) in PROFILES.items() for t in types}
+    weights = np.array([PROFILES[group_of.get(t, 'other')][0] for t in PRODUCT_TYPES])
+    medians = np.array([PROFILES[group_of.get(t, 'other')][1] for t in PRODUCT_TYPES], dtype=float)
+    return weights / weights.sum(), medians
+
+def generate_frame(n: int, seed: int = 7, years: float = 3.0,
+                   end: datetime = datetime(2025, 1, 1)) -> pd.DataFrame:
+    """`n` purchases, oldest first, as date/type/brand/price/co2_impact with dates as 'YYYY-MM-DD HH:MM'."""
+    rng = np.random.default_rng(seed)
+    probs, medians = _type_profile()
+    type_idx = rng.choice(len(PRODUCT_TYPES), size=n, p=probs)
+    prices = np.exp(rng.normal(np.log(medians[type_idx]), PRICE_SPREAD))
+    prices = np.clip(np.round(prices, -1), 10, 200_000)
+
+    # Uniform days, shopping hours 08:00-22:00.
+    days = rng.integers(0, max(1, int(years * 365)), size=n)
+    minutes = rng.integers(8 * 60, 22 * 60, size=n)
+    stamps = np.datetime64(end, 'D') - days.astype('timedelta64[D]') + minutes.astype('timedelta64[m]')
+    stamps.sort()
+
+    types = np.array(PRODUCT_TYPES, dtype=object)[type_idx]
+    frame = pd.DataFrame({
+        'date': np.char.replace(np.datetime_as_string(stamps, unit='m'), 'T', ' ').astype(object),
+        'type': types,
+        'brand': np.array(ALL_BRANDS, dtype=object)[rng.integers(0, len(ALL_BRANDS), size=n)],
+        'price': prices,
+    })
+    frame['co2_impact'] = score_batch(frame['type'], frame['price'])
+    return frame
+
+def generate_records(n: int, seed: int = 7, **kwargs) -> List[Dict]:
+    """Same history as `generate_frame`, as the list of dicts the storage layer returns."""
+    return generate_frame(n, seed, **kwargs).to_dict('records')
+
+def populate(store: StorageBackend, n: int, user_id: str = DEFAULT_USER, seed: int = 7) -> None:
+    """Replace `user_id`'s data with a fresh `n`-purchase history."""
+    store.save(get_default_data(), user_id)
+    with store.bulk_append(user_id) as batch:
+        batch.append(generate_frame(n, seed))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--out', type=Path, required=True, help="CSV file to write (the import format)")
+    args = parser.parse_args()
+    generate_frame(args.size, args.seed).drop(columns='co2_impact').to_csv(args.out, index=False)
+
+if __name__ == '__main__':
+    main()
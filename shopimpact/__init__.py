@@ -0,0 +1,4 @@
+"""
+ShopImpact core package.
+Storage and domain logic shared by the Streamlit app.
+"""
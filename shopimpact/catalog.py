@@ -0,0 +1,185 @@
+"""
+ShopImpact - Catalog
+The product and brand catalog behind the purchase pickers: the built-in
+lists plus an optional external CSV (tens of thousands of entries), loaded
+once per process into a prefix / trigram index for typeahead search and
+per-product CO₂ multipliers.
+
+    kind,name,multiplier
+    product,Bamboo Toothbrush,0.3
+    brand,Allbirds,
+"""
+
+import csv
+import logging
+import os
+import re
+import threading
+from bisect import bisect_left
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from shopimpact.impact import ALL_BRANDS, PRODUCT_TYPES
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILE = Path(os.environ.get("SHOPIMPACT_CATALOG", "catalog.csv"))
+KINDS = ('product', 'brand')
+TOP_K = 20
+_SPACES = re.compile(r'\s+')
+
+def fold(text: str) -> str:
+    """Search form of a name or query: case-folded, single-spaced."""
+    return _SPACES.sub(' ', text.casefold()).strip()
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class _KindIndex:
+    """
+    Names of one kind. `starts` holds every folded name, `words` every
+    word-boundary suffix ("north face", "face" for "The North Face"); both
+    are sorted, so a prefix is a bisect plus a walk of at most k entries.
+    Substrings fall back to trigram posting lists, which are built
+    separately (`build_grams`) because they take most of the build time.
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.folded: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self.starts: List[Tuple[str, int]] = []
+        self.words: List[Tuple[str, int]] = []
+        self.grams: Optional[Dict[str, List[int]]] = None  # until build_grams has run
+
+    def add(self, name: str) -> bool:
+        if name in self.ids:
+            return False
+        self.ids[name] = len(self.names)
+        self.names.append(name)
+        self.folded.append(fold(name))
+        return True
+
+    def build(self) -> None:
+        starts, words = [], []
+        for i, text in enumerate(self.folded):
+            starts.append((text, i))
+            words.extend((text[m.start() + 1:], i) for m in re.finditer(' ', text))
+        starts.sort()
+        words.sort()
+        self.starts, self.words = starts, words
+
+    def build_grams(self) -> None:
+        grams: Dict[str, List[int]] = {}
+        for i, text in enumerate(self.folded):
+            for gram in trigrams(text):
+                grams.setdefault(gram, []).append(i)
+        self.grams = grams  # published whole: searches see no index or a complete one
+
+    @staticmethod
+    def _prefixed(keys: List[Tuple[str, int]], query: str, found: Dict[int, None], k: int) -> None:
+        i = bisect_left(keys, (query, -1))
+        while i < len(keys) and len(found) < k and keys[i][0].startswith(query):
+            found.setdefault(keys[i][1])
+            i += 1
+
+    def search(self, query: str, k: int) -> List[str]:
+        query = fold(query)
+        if not query:
+            return self.names[:k]
+        found: Dict[int, None] = {}  # ordered set of ids: name prefix, then word prefix, then substring
+        self._prefixed(self.starts, query, found, k)
+        if len(found) < k:
+            self._prefixed(self.words, query, found, k)
+        grams = self.grams
+        if len(found) < k and len(query) >= 3 and grams is not None:
+            postings = [grams.get(gram, ()) for gram in trigrams(query)]
+            for i in min(postings, key=len):
+                if len(found) >= k:
+                    break
+                if i not in found and query in self.folded[i]:
+                    found[i] = None
+        return [self.names[i] for i in found]
+
+class CatalogIndex:
+    """
+    Searchable product and brand names; products can carry a CO₂
+    multiplier. Built-in names come first, so an empty query lists them.
+    """
+
+    def __init__(self):
+        self._kinds = {kind: _KindIndex() for kind in KINDS}
+        self._multipliers: Dict[str, float] = {}
+        for name in PRODUCT_TYPES:
+            self._kinds['product'].add(name)
+        for name in ALL_BRANDS:
+            self._kinds['brand'].add(name)
+        self._builtin = len(PRODUCT_TYPES) + len(ALL_BRANDS)
+        self._names: Dict[str, frozenset] = {}
+
+    @classmethod
+    def from_csv(cls, path: Path) -> 'CatalogIndex':
+        """The built-in catalog plus `path` (columns kind,name,multiplier). Bad rows are skipped and counted."""
+        index = cls()
+        skipped = 0
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                try:
+                    index.add(row['kind'].strip(), row['name'].strip(), row.get('multiplier'))
+                except (KeyError, ValueError, AttributeError):
+                    skipped += 1
+        if skipped:
+            logger.warning("Skipped %d unreadable catalog rows in %s", skipped, path)
+        return index.build()
+
+    def add(self, kind: str, name: str, multiplier: Optional[str] = None) -> None:
+        if kind not in self._kinds or not name:
+            raise ValueError(f"Bad catalog entry {kind!r}, {name!r}")
+        factor = None if multiplier in (None, '') else float(multiplier)
+        added = self._kinds[kind].add(name)
+        # Built-in product types keep their built-in factors, so stored scores never change.
+        if kind == 'product' and factor is not None and (added or name in self._multipliers):
+            self._multipliers[name] = factor
+
+    def build(self) -> 'CatalogIndex':
+        for kind, index in self._kinds.items():
+            index.build()
+            self._names[kind] = frozenset(index.ids)
+        return self
+
+    def build_grams(self) -> None:
+        """Enable substring matches. Until this has run, search only matches prefixes."""
+        for index in self._kinds.values():
+            index.build_grams()
+
+    def __len__(self) -> int:
+        return sum(len(index.names) for index in self._kinds.values())
+
+    @property
+    def external(self) -> int:
+        """Entries loaded from the catalog file."""
+        return len(self) - self._builtin
+
+    def search(self, query: str, kind: str = 'product', k: int = TOP_K) -> List[str]:
+        """Up to `k` names of `kind` matching `query`: whole-name prefixes, then word prefixes, then substrings."""
+        return self._kinds[kind].search(query, k)
+
+    def names(self, kind: str) -> frozenset:
+        """Every name of `kind`, for validation."""
+        return self._names[kind]
+
+    def multiplier(self, product: str) -> Optional[float]:
+        return self._multipliers.get(product)
+
+@lru_cache(maxsize=None)
+def get_catalog() -> CatalogIndex:
+    """The process-wide catalog: loaded from SHOPIMPACT_CATALOG on first use, built-ins only if it is missing."""
+    if not CATALOG_FILE.exists():
+        index = CatalogIndex().build()
+        index.build_grams()
+        return index
+    index = CatalogIndex.from_csv(CATALOG_FILE)
+    logger.info("Loaded %d catalog entries from %s", index.external, CATALOG_FILE)
+    threading.Thread(target=index.build_grams, name="shopimpact-catalog-grams", daemon=True).start()
+    return index
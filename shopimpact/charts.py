@@ -0,0 +1,104 @@
+"""
+ShopImpact - Charts
+Server-side data reduction for the Analytics charts: time buckets or LTTB
+for the time series, sampling for the scatter plot and a grouped sunburst
+input, so the browser gets at most a point budget's worth of data.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_POINT_BUDGET = 2000
+# Bucket sizes tried in order; the finest one that fits the budget wins.
+TIME_BUCKETS = (('D', 'day'), ('W', 'week'), ('MS', 'month'))
+# Above this many points Plotly's SVG scatter gets sluggish; switch to WebGL.
+WEBGL_THRESHOLD = 1000
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of `n_out` points of (x, y)
+    that keep the visual shape of the line. `x` must be sorted ascending.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    picked = np.empty(n_out, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        # The next bucket's centroid is the third corner of the triangle.
+        cx = x[nxt_lo:nxt_hi].mean()
+        cy = y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[prev] - cx) * (y[lo:hi] - y[prev]) - (x[prev] - x[lo:hi]) * (cy - y[prev]))
+        prev = lo + int(area.argmax())
+        picked[i + 1] = prev
+    return picked
+
+def spending_timeseries(df: pd.DataFrame, budget: int = DEFAULT_POINT_BUDGET,
+                        method: str = 'buckets') -> Tuple[pd.DataFrame, Optional[str]]:
+    """
+    Long-format (date, variable, value) frame of price and CO₂ for the
+    "Spending vs CO₂" line chart, plus a description of the reduction
+    applied (None when every purchase is plotted).
+
+    `method='buckets'` sums purchases per day/week/month, picking the finest
+    bucket that fits `budget`; `method='lttb'` keeps `budget` representative
+    purchases per series instead. A `budget` of 0 disables reduction.
+    """
+    series = df[['date', 'price', 'co2_impact']].sort_values('date', kind='stable')
+    if not budget or len(series) <= budget:
+        return series.melt(id_vars='date'), None
+
+    if method == 'lttb':
+        x = series['date'].to_numpy(dtype='datetime64[s]').astype(np.int64)
+        parts = []
+        for column in ('price', 'co2_impact'):
+            keep = lttb(x, series[column].to_numpy(), budget)
+            part = series.iloc[keep][['date', column]].rename(columns={column: 'value'})
+            part.insert(1, 'variable', column)
+            parts.append(part)
+        return pd.concat(parts, ignore_index=True), f"{budget:,} of {len(series):,} purchases (LTTB)"
+
+    indexed = series.set_index('date')
+    for freq, label in TIME_BUCKETS:
+        totals = indexed.resample(freq).sum()
+        if len(totals) <= budget or freq == TIME_BUCKETS[-1][0]:
+            totals = totals[(totals['price'] != 0) | (totals['co2_impact'] != 0)]
+            return totals.reset_index().melt(id_vars='date'), f"totals per {label}"
+
+def scatter_points(df: pd.DataFrame, budget: int = DEFAULT_POINT_BUDGET,
+                   seed: int = 0) -> Tuple[pd.DataFrame, bool]:
+    """
+    Rows for the price-vs-CO₂ scatter: all of them within `budget`, otherwise
+    a reproducible uniform sample of `budget` rows. Also returns whether the
+    plot should use WebGL.
+    """
+    points = df[['price', 'co2_impact', 'type', 'brand']]
+    if budget and len(points) > budget:
+        points = points.sample(n=budget, random_state=seed)
+    return points, len(points) > WEBGL_THRESHOLD
+
+def sunburst_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per (type, brand) with `co2_total` (the wedge size) and
+    `co2_impact` (the colour). The colour is the CO₂-weighted mean per item,
+    so Plotly's weighted roll-up reproduces what it would compute from the
+    raw rows.
+    """
+    grouped = (
+        df.assign(co2_sq=df['co2_impact'] ** 2)
+        .groupby(['type', 'brand'], observed=True)[['co2_impact', 'co2_sq']]
+        .sum()
+    )
+    grouped = grouped[grouped['co2_impact'] > 0]
+    return pd.DataFrame({
+        'co2_total': grouped['co2_impact'],
+        'co2_impact': grouped['co2_sq'] / grouped['co2_impact'],
+    }).reset_index()
@@ -0,0 +1,86 @@
+"""
+ShopImpact - Exporter
+Streaming export of purchase history to CSV or Parquet: rows come from
+storage in chunks and are written as they arrive. With the SQLite backend
+memory is bounded by the chunk size; the JSON backend has to load the
+user's file first.
+"""
+
+from typing import IO, Dict, Iterable, Iterator, List, Optional
+
+from shopimpact.storage import DEFAULT_USER, PURCHASE_COLUMNS, StorageBackend
+
+# format -> (MIME type, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', '.csv'),
+    'parquet': ('application/vnd.apache.parquet', '.parquet'),
+}
+DATE_FORMAT = '%Y-%m-%d %H:%M'
+
+class ExportError(ValueError):
+    """The export can't be produced (unknown format, missing optional dependency); nothing was written."""
+
+def _frames(chunks: Iterable[List[Dict]]):
+    import pandas as pd
+
+    for chunk in chunks:
+        yield pd.DataFrame.from_records(chunk, columns=list(PURCHASE_COLUMNS))
+
+def write_csv(chunks: Iterable[List[Dict]], out: IO[bytes]) -> int:
+    """CSV in the import format (plus `co2_impact`), header first even when there are no rows."""
+    count = 0
+    header = ','.join(PURCHASE_COLUMNS) + '\n'
+    out.write(header.encode('utf-8'))
+    for frame in _frames(chunks):
+        out.write(frame.to_csv(index=False, header=False, lineterminator='\n').encode('utf-8'))
+        count += len(frame)
+    return count
+
+def write_parquet(chunks: Iterable[List[Dict]], out: IO[bytes]) -> int:
+    """Parquet with one row group per chunk; `date` is a timestamp, type/brand are dictionary-encoded."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ExportError("Parquet export needs pyarrow (pip install pyarrow)") from e
+    import pandas as pd
+
+    schema = pa.schema([
+        ('date', pa.timestamp('s')),
+        ('type', pa.string()),
+        ('brand', pa.string()),
+        ('price', pa.float64()),
+        ('co2_impact', pa.float64()),
+    ])
+    count = 0
+    with pq.ParquetWriter(out, schema, compression='zstd', use_dictionary=['type', 'brand']) as writer:
+        for frame in _frames(chunks):
+            frame['date'] = pd.to_datetime(frame['date'], format=DATE_FORMAT).astype('datetime64[s]')
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+            count += len(frame)
+    return count
+
+WRITERS = {'csv': write_csv, 'parquet': write_parquet}
+
+def export_purchases(
+    store: StorageBackend,
+    out: IO[bytes],
+    fmt: str = 'csv',
+    user_id: str = DEFAULT_USER,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    types: Optional[Iterable[str]] = None,
+    chunk_size: int = 50_000,
+) -> int:
+    """
+    Write `user_id`'s purchases with `start <= date < end` (dates in the
+    app's '%Y-%m-%d[ %H:%M]' form; either bound optional) and, if given, a
+    type in `types` to the binary stream `out`, in date order. Returns the
+    number of rows written.
+    """
+    writer = WRITERS.get(fmt)
+    if writer is None:
+        raise ExportError(f"Unknown export format {fmt!r} (expected one of: {', '.join(WRITERS)})")
+    chunks: Iterator[List[Dict]] = store.iter_purchases(user_id, start=start, end=end, types=types,
+                                                        chunk_size=chunk_size)
+    return writer(chunks, out)
@@ -0,0 +1,259 @@
+"""
+ShopImpact - Impact
+Product catalog, eco classification, running aggregates and badge rules,
+free of any Streamlit dependency.
+"""
+
+import operator
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+if TYPE_CHECKING:  # pandas is imported on first use: the single-purchase path never needs it
+    import pandas as pd
+
+# ==================== CATALOG ====================
+PRODUCT_TYPES = [
+    'Fast Fashion', 'T-Shirt', 'Jeans', 'Dress', 'Suit', 'Jacket', 'Sweater', 'Hoodie', 'Shorts', 'Skirt',
+    'Blazer', 'Coat', 'Pants', 'Leggings', 'Activewear', 'Swimwear', 'Underwear', 'Socks', 'Shoes', 'Sneakers',
+    'Electronics', 'Smartphone', 'Laptop', 'Tablet', 'Desktop Computer', 'Monitor', 'Keyboard', 'Mouse',
+    'Headphones', 'Gaming Console', 'Smartwatch', 'Camera', 'TV', 'Speaker', 'Drone',
+    'Local Groceries', 'Organic Vegetables', 'Organic Fruits', 'Meat', 'Dairy Products', 'Snacks',
+    'Home Decor', 'Sofa', 'Chair', 'Table', 'Bed', 'Mattress', 'Kitchenware', 'Appliance',
+    'Cosmetics', 'Skincare', 'Perfume', 'Hair Care', 'Personal Care',
+    'Books (New)', 'Books (Used)', 'E-book', 'Vinyl Record', 'Video Game',
+    'Yoga Mat', 'Gym Equipment', 'Bicycle', 'Sports Gear', 'Camping Gear',
+    'Car Parts', 'Tires', 'Car Accessories',
+    'Restaurant Meal', 'Fast Food', 'Coffee', 'Dessert',
+    'Leather Goods', 'Vegan Leather',
+    'Second-Hand Item', 'Thrifted Clothing', 'Used Electronics', 'Vintage Furniture', 'Refurbished Tech',
+    'Office Supplies', 'Stationery', 'Art Supplies',
+    'Gift Card', 'Subscription', 'Event Ticket', 'Digital Download', '500+ (Other)'
+]
+
+ALL_BRANDS = [
+    'Zara', 'H&M', 'Nike', 'Adidas', 'Uniqlo', 'Gucci', 'Louis Vuitton', 'Patagonia', 'The North Face', 'Levi\'s',
+    'Apple', 'Samsung', 'Sony', 'Dell', 'HP', 'Lenovo', 'Asus', 'Microsoft', 'Google', 'Canon',
+    'Whole Foods', 'Trader Joe\'s', 'Nestle', 'Coca-Cola', 'Pepsi', 'Danone', 'Beyond Meat',
+    'IKEA', 'West Elm', 'Pottery Barn', 'Ashley Furniture', 'Wayfair',
+    'Sephora', 'L\'Oreal', 'Estee Lauder', 'Mac', 'Fenty Beauty', 'The Body Shop', 'Lush',
+    'Amazon', 'Barnes & Noble', 'Penguin Random House', 'Nintendo', 'PlayStation', 'Xbox',
+    'Toyota', 'Honda', 'Ford', 'Tesla', 'BMW',
+    'Local Thrift Store', 'Goodwill', 'Salvation Army', 'Depop', 'Poshmark', 'Etsy', 'eBay',
+    'Local Farm', 'Farmers Market', 'Small Business', 'Handmade', 'Generic', 'Other'
+]
+
+ECO_FRIENDLY_CATEGORIES = frozenset([
+    'Second-Hand Item', 'Local Groceries', 'Books (Used)', 'Thrifted Clothing',
+    'Used Electronics', 'Vintage Furniture', 'Organic Vegetables', 'Organic Fruits',
+    'Refurbished Tech', 'Bicycle', 'Vegan Leather', 'Digital Download'
+])
+
+# ==================== CO₂ SCORING ====================
+BASE_MULTIPLIERS = {
+    'Fast Fashion': 2.5, 'Jeans': 3.2, 'Coat': 4.2, 'Shoes': 3.0,
+    'Electronics': 1.8, 'Smartphone': 2.5, 'Laptop': 3.0, 'Desktop Computer': 3.5,
+    'Meat': 1.5, 'Dairy Products': 0.6, 'Local Groceries': 0.3, 'Organic Vegetables': 0.2,
+    'Sofa': 4.0, 'Bed': 3.5, 'Appliance': 2.0,
+    'Cosmetics': 1.5, 'Perfume': 1.5,
+    'Books (New)': 0.5, 'Books (Used)': 0.05, 'E-book': 0.02,
+    'Bicycle': 5.0, 'Car Parts': 2.0,
+    'Second-Hand Item': 0.1, 'Thrifted Clothing': 0.08, 'Used Electronics': 0.15,
+    'Digital Download': 0.02, 'Service': 0.0
+}
+
+ECO_DISCOUNT = 0.5
+_BUILTIN_TYPES = frozenset(PRODUCT_TYPES)
+
+# Simplified Multipliers for logic
+def get_product_multiplier(product_type: str) -> float:
+    if product_type in BASE_MULTIPLIERS:
+        return BASE_MULTIPLIERS[product_type]
+    if product_type not in _BUILTIN_TYPES:
+        # External catalog products carry their own factor. Imported here: the catalog imports this module.
+        from shopimpact.catalog import get_catalog
+
+        multiplier = get_catalog().multiplier(product_type)
+        if multiplier is not None:
+            return multiplier
+    if 'Used' in product_type or 'Second-Hand' in product_type or 'Thrift' in product_type:
+        return 0.1
+    elif 'Leather' in product_type:
+        return 3.5
+    elif 'Plastic' in product_type:
+        return 2.0
+    else:
+        return 1.0
+
+def _co2_factor(product_type: str) -> float:
+    multiplier = get_product_multiplier(product_type)
+    return multiplier * ECO_DISCOUNT if product_type in ECO_FRIENDLY_CATEGORIES else multiplier
+
+# Final per-type factor with the eco discount folded in: co2 = price * factor / 100.
+# Halving is exact in binary floating point, so this matches the original
+# `price * multiplier / 100`, then `*= 0.5` for eco types, bit for bit.
+CO2_FACTORS: Dict[str, float] = {t: _co2_factor(t) for t in PRODUCT_TYPES}
+
+def co2_factor(product_type: str) -> float:
+    factor = CO2_FACTORS.get(product_type)
+    return _co2_factor(product_type) if factor is None else factor
+
+def co2_factors(product_types: Sequence[str]) -> np.ndarray:
+    """Factor lookup table aligned with a vocabulary, for scoring by type code."""
+    return np.array([co2_factor(t) for t in product_types], dtype=np.float64)
+
+def score_purchase(product_type: str, price: float) -> float:
+    return float(price * co2_factor(product_type) / 100)
+
+def score_batch(product_types: Sequence[str], prices: Sequence[float]) -> np.ndarray:
+    """
+    Vectorized `score_purchase` over parallel sequences (lists, arrays,
+    Series, Categoricals). Unknown types are resolved once per distinct value.
+    """
+    import pandas as pd
+
+    types = pd.Series(product_types, copy=False)
+    factors = types.map(CO2_FACTORS)
+    missing = factors.isna()
+    if missing.any():
+        extra = {t: _co2_factor(t) for t in types[missing].unique()}
+        factors[missing] = types[missing].map(extra)
+    return np.asarray(prices, dtype=np.float64) * factors.to_numpy(dtype=np.float64) / 100
+
+# ==================== RUNNING AGGREGATES ====================
+def _bump(bucket: Dict[str, Dict], key: str, price: float, co2: float, eco: bool) -> None:
+    row = bucket.get(key)
+    if row is None:
+        row = bucket[key] = {'count': 0, 'spend': 0.0, 'co2': 0.0, 'eco_count': 0}
+    row['count'] += 1
+    row['spend'] += price
+    row['co2'] += co2
+    row['eco_count'] += eco
+
+class ImpactAggregates:
+    """
+    Totals that the dashboard needs, maintained one purchase at a time.
+    `add` is O(1); the full history is only scanned by `from_purchases`
+    (load of pre-aggregate data, reset). Serializes to plain JSON.
+    """
+
+    def __init__(self, data: Optional[Dict] = None):
+        data = data or {}
+        self.count: int = data.get('count', 0)
+        self.total_spend: float = data.get('total_spend', 0.0)
+        self.total_co2: float = data.get('total_co2', 0.0)
+        self.eco_count: int = data.get('eco_count', 0)
+        self.by_category: Dict[str, Dict] = data.get('by_category', {})
+        self.by_brand: Dict[str, Dict] = data.get('by_brand', {})
+        self.by_month: Dict[str, Dict] = data.get('by_month', {})
+
+    @classmethod
+    def from_purchases(cls, purchases: Iterable[Dict]) -> 'ImpactAggregates':
+        aggs = cls()
+        for p in purchases:
+            aggs.add(p)
+        return aggs
+
+    def add(self, purchase: Dict) -> None:
+        price = purchase['price']
+        co2 = purchase['co2_impact']
+        eco = purchase['type'] in ECO_FRIENDLY_CATEGORIES
+        self.count += 1
+        self.total_spend += price
+        self.total_co2 += co2
+        self.eco_count += eco
+        _bump(self.by_category, purchase['type'], price, co2, eco)
+        _bump(self.by_brand, purchase['brand'], price, co2, eco)
+        # Dates are '%Y-%m-%d %H:%M' strings: the first 7 chars are the month.
+        _bump(self.by_month, purchase['date'][:7], price, co2, eco)
+
+    def add_frame(self, frame: 'pd.DataFrame') -> None:
+        """Vectorized `add` for a chunk of purchases (bulk import)."""
+        if frame.empty:
+            return
+        work = frame.assign(
+            eco=frame['type'].isin(ECO_FRIENDLY_CATEGORIES).astype(int),
+            month=frame['date'].str[:7],
+        )
+        self.count += len(work)
+        self.total_spend += float(work['price'].sum())
+        self.total_co2 += float(work['co2_impact'].sum())
+        self.eco_count += int(work['eco'].sum())
+        for bucket, key in ((self.by_category, 'type'), (self.by_brand, 'brand'), (self.by_month, 'month')):
+            grouped = work.groupby(key, sort=False, observed=True).agg(
+                count=('price', 'size'), spend=('price', 'sum'), co2=('co2_impact', 'sum'), eco_count=('eco', 'sum'),
+            )
+            for name, count, spend, co2, eco_count in grouped.itertuples(name=None):
+                row = bucket.setdefault(name, {'count': 0, 'spend': 0.0, 'co2': 0.0, 'eco_count': 0})
+                row['count'] += int(count)
+                row['spend'] += float(spend)
+                row['co2'] += float(co2)
+                row['eco_count'] += int(eco_count)
+
+    def merge(self, other: 'ImpactAggregates') -> None:
+        """Add `other`'s purchases to these totals, e.g. a bulk import staged apart from them."""
+        self.count += other.count
+        self.total_spend += other.total_spend
+        self.total_co2 += other.total_co2
+        self.eco_count += other.eco_count
+        for bucket, more in ((self.by_category, other.by_category), (self.by_brand, other.by_brand),
+                             (self.by_month, other.by_month)):
+            for name, extra in more.items():
+                row = bucket.setdefault(name, {'count': 0, 'spend': 0.0, 'co2': 0.0, 'eco_count': 0})
+                for field in ('count', 'spend', 'co2', 'eco_count'):
+                    row[field] += extra[field]
+
+    @property
+    def eco_rate(self) -> float:
+        return self.eco_count / self.count * 100 if self.count else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'total_spend': self.total_spend,
+            'total_co2': self.total_co2,
+            'eco_count': self.eco_count,
+            'by_category': self.by_category,
+            'by_brand': self.by_brand,
+            'by_month': self.by_month,
+        }
+
+# ==================== BADGE SYSTEM ====================
+# Each rule is a list of (counter, op, value) conditions that must all hold.
+# Counters come from `badge_counters`: running aggregates plus the purchase just logged.
+BADGES = {
+    'first_step': {'name': '🌱 First Step', 'desc': 'Logged your first purchase', 'icon': '🌱',
+                   'rule': [('count', '>=', 1)]},
+    'thrift_king': {'name': '👑 Thrift King', 'desc': 'Bought 3 second-hand items', 'icon': '👑',
+                    'rule': [('eco_count', '>=', 3)]},
+    'low_carbon': {'name': '🍃 Low Carbon', 'desc': 'Logged an item with < 1kg CO₂', 'icon': '🍃',
+                   'rule': [('last_co2', '<', 1.0)]},
+    'big_saver': {'name': '💰 Big Saver', 'desc': 'Spent over ₹10,000 in one go', 'icon': '💰',
+                  'rule': [('last_price', '>', 10000)]},
+    'eco_warrior': {'name': '🛡️ Eco Warrior', 'desc': 'Maintained < 50kg CO₂ total over 5+ items', 'icon': '🛡️',
+                    'rule': [('count', '>=', 5), ('total_co2', '<', 50)]},
+    'consistent': {'name': '📅 Consistent', 'desc': 'Logged 5 items total', 'icon': '📅',
+                   'rule': [('count', '>=', 5)]},
+}
+
+RULE_OPS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge, '==': operator.eq}
+
+def badge_counters(aggs: ImpactAggregates, last_purchase: Optional[Dict]) -> Dict[str, float]:
+    return {
+        'count': aggs.count,
+        'eco_count': aggs.eco_count,
+        'total_spend': aggs.total_spend,
+        'total_co2': aggs.total_co2,
+        'last_price': last_purchase['price'] if last_purchase else 0.0,
+        'last_co2': last_purchase['co2_impact'] if last_purchase else float('inf'),
+    }
+
+def evaluate_badges(aggs: ImpactAggregates, last_purchase: Optional[Dict], owned: Iterable[str]) -> List[str]:
+    """Every badge not yet in `owned` whose rule holds, in registry order. O(number of rules)."""
+    counters = badge_counters(aggs, last_purchase)
+    owned = set(owned)
+    return [
+        badge_id for badge_id, badge in BADGES.items()
+        if badge_id not in owned
+        and all(RULE_OPS[op](counters[name], value) for name, op, value in badge['rule'])
+    ]
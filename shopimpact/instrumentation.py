@@ -0,0 +1,140 @@
+"""
+ShopImpact - Instrumentation
+Named-phase timing of script runs: the phases of the current run, plus
+rolling per-phase percentiles shared by the process and exportable as
+Prometheus text or JSON.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple, Union
+
+QUANTILES = (0.5, 0.9, 0.99)
+METRIC_NAME = 'shopimpact_phase_seconds'
+
+_DISABLED = nullcontext()
+
+class _Phase:
+    __slots__ = ('profiler', 'run', 'name', 'start')
+
+    def __init__(self, profiler: 'Profiler', run: List, name: str):
+        self.profiler, self.run, self.name = profiler, run, name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.run.append((self.name, elapsed))
+        self.profiler.record(self.name, elapsed)
+
+class Profiler:
+    """
+    One per process. `start_run(enabled)` begins a run on the calling thread
+    (Streamlit executes each script run on its own thread), `phase(name)`
+    times a block of that run and `finish_run()` records its total. On a
+    disabled run `phase` returns a shared no-op context, so instrumented
+    code costs one thread-local lookup.
+    """
+
+    def __init__(self, window: int = 512):
+        self.window = window
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+        self._count: Dict[str, int] = {}
+        self._sum: Dict[str, float] = {}
+        self._last_dump = 0.0
+
+    # ---------- recording ----------
+    def start_run(self, enabled: bool, started: Optional[float] = None) -> None:
+        """`started` backdates the run to an earlier `time.perf_counter()` reading (e.g. script start)."""
+        self._local.run = [] if enabled else None
+        self._local.started = time.perf_counter() if started is None else started
+
+    def finish_run(self) -> None:
+        """Record the whole run as phase 'run' (runs cut short by a rerun or stop are not counted)."""
+        self.mark('run')
+
+    def mark(self, name: str) -> None:
+        """Record the time from run start to now as phase `name` (e.g. 'first_paint')."""
+        run = getattr(self._local, 'run', None)
+        if run is not None:
+            elapsed = time.perf_counter() - self._local.started
+            run.append((name, elapsed))
+            self.record(name, elapsed)
+
+    def phase(self, name: str):
+        run = getattr(self._local, 'run', None)
+        if run is None:
+            return _DISABLED
+        return _Phase(self, run, name)
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+                self._count[name] = 0
+                self._sum[name] = 0.0
+            samples.append(seconds)
+            self._count[name] += 1
+            self._sum[name] += seconds
+
+    def current_run(self) -> List[Tuple[str, float]]:
+        """(phase, seconds) in completion order for the calling thread's run; empty if disabled."""
+        return list(getattr(self._local, 'run', None) or ())
+
+    # ---------- reporting ----------
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per phase: lifetime count and sum, and percentiles over the last `window` samples."""
+        with self._lock:
+            snapshot = {name: (sorted(s), self._count[name], self._sum[name]) for name, s in self._samples.items()}
+        result = {}
+        for name, (ordered, count, total) in sorted(snapshot.items()):
+            row = {'count': count, 'sum': total}
+            for q in QUANTILES:
+                row[f'p{q * 100:g}'] = ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+            result[name] = row
+        return result
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition format: one summary metric labelled by phase."""
+        lines = [
+            f"# HELP {METRIC_NAME} Duration of named phases of a ShopImpact script run.",
+            f"# TYPE {METRIC_NAME} summary",
+        ]
+        for name, row in self.summary().items():
+            label = name.replace('\\', '\\\\').replace('"', '\\"')
+            for q in QUANTILES:
+                lines.append(f'{METRIC_NAME}{{phase="{label}",quantile="{q:g}"}} {row[f"p{q * 100:g}"]:.6f}')
+            lines.append(f'{METRIC_NAME}_sum{{phase="{label}"}} {row["sum"]:.6f}')
+            lines.append(f'{METRIC_NAME}_count{{phase="{label}"}} {row["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: Union[str, Path]) -> None:
+        """Write the summary atomically: JSON for a `.json` path, Prometheus text otherwise."""
+        path = Path(path)
+        if path.suffix == '.json':
+            body = json.dumps({'generated': time.time(), 'phases': self.summary()}, indent=2)
+        else:
+            body = self.prometheus()
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp.write_text(body)
+        os.replace(tmp, path)
+
+    def maybe_dump(self, path: Optional[Union[str, Path]], interval: float) -> None:
+        """`dump` at most once per `interval` seconds across all threads."""
+        if not path:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_dump < interval:
+                return
+            self._last_dump = now
+        self.dump(path)
@@ -0,0 +1,259 @@
+"""
+ShopImpact - Purchase Store
+Columnar in-memory purchase history: typed NumPy arrays instead of a list
+of dicts, with type/brand stored as codes into the catalog vocabularies,
+kept in date order for binary-search range queries.
+"""
+
+from datetime import date, datetime
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+if TYPE_CHECKING:  # only to_frame needs pandas; it imports it on first use
+    import pandas as pd
+
+from shopimpact.impact import ALL_BRANDS, ECO_FRIENDLY_CATEGORIES, PRODUCT_TYPES, ImpactAggregates, co2_factors
+
+DateLike = Union[str, date, datetime, np.datetime64]
+SORT_KEYS = ('date', 'price', 'co2_impact')
+
+def to_datetime64(value: DateLike) -> np.datetime64:
+    """Seconds-resolution datetime64 from a date, datetime or '%Y-%m-%d[ %H:%M]' string."""
+    if isinstance(value, str):
+        value = value.replace(' ', 'T')
+    return np.datetime64(value, 's')
+
+class Vocabulary:
+    """String <-> int code mapping. Seeded from the catalog, grows for unseen values."""
+
+    def __init__(self, values: Sequence[str]):
+        self.values: List[str] = list(values)
+        self.index: Dict[str, int] = {v: i for i, v in enumerate(self.values)}
+
+    def code(self, value: str) -> int:
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def codes(self, values: Iterable[str]) -> np.ndarray:
+        return np.fromiter((self.code(v) for v in values), dtype=np.int32)
+
+class PurchaseColumns:
+    """
+    Purchases as parallel arrays:
+
+    - `date`        datetime64[s] (epoch seconds)
+    - `type_code`   int32 code into the product-type vocabulary
+    - `brand_code`  int32 code into the brand vocabulary
+    - `price`       float64
+    - `co2_impact`  float64
+
+    Rows are kept sorted by date (ties in insertion order), so `between`
+    is a binary search returning a view. Appends are amortized O(1)
+    (capacity doubles); a backdated append shifts the newer rows up by one,
+    and `extend` with out-of-order records re-sorts once. Slicing returns a
+    view that shares the arrays; a view reallocates before its first append,
+    so it never writes into its parent. `page` cuts one sorted page in
+    O(page size) once the sort order is known. `to_frame` hands the arrays
+    to pandas without copying them.
+    """
+
+    def __init__(self, capacity: int = 64, types: Optional[Vocabulary] = None,
+                 brands: Optional[Vocabulary] = None):
+        self.types = types or Vocabulary(PRODUCT_TYPES)
+        self.brands = brands or Vocabulary(ALL_BRANDS)
+        self._n = 0
+        self._date = np.empty(capacity, dtype='datetime64[s]')
+        self._type = np.empty(capacity, dtype=np.int32)
+        self._brand = np.empty(capacity, dtype=np.int32)
+        self._price = np.empty(capacity, dtype=np.float64)
+        self._co2 = np.empty(capacity, dtype=np.float64)
+        self._orders: Dict[str, np.ndarray] = {}  # sort key -> row order, dropped on every write
+
+    # ---------- construction ----------
+    @classmethod
+    def from_records(cls, records: Sequence[Dict]) -> 'PurchaseColumns':
+        cols = cls(capacity=max(64, len(records)))
+        cols.extend(records)
+        return cols
+
+    def _columns(self):
+        return (self._date, self._type, self._brand, self._price, self._co2)
+
+    def _reserve(self, extra: int) -> None:
+        needed = self._n + extra
+        capacity = len(self._date)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 64)
+        grown = []
+        for arr in self._columns():
+            new = np.empty(new_capacity, dtype=arr.dtype)
+            new[:self._n] = arr[:self._n]
+            grown.append(new)
+        self._date, self._type, self._brand, self._price, self._co2 = grown
+
+    def append(self, purchase: Dict) -> None:
+        when = to_datetime64(purchase['date'])
+        self._orders.clear()
+        self._reserve(1)
+        i = self._n
+        if i and when < self._date[i - 1]:
+            i = int(np.searchsorted(self._date[:self._n], when, side='right'))
+            for arr in self._columns():
+                arr[i + 1:self._n + 1] = arr[i:self._n]
+        self._date[i] = when
+        self._type[i] = self.types.code(purchase['type'])
+        self._brand[i] = self.brands.code(purchase['brand'])
+        self._price[i] = purchase['price']
+        self._co2[i] = purchase['co2_impact']
+        self._n += 1
+
+    def extend(self, records: Sequence[Dict]) -> None:
+        self._orders.clear()
+        k = len(records)
+        self._reserve(k)
+        lo, hi = self._n, self._n + k
+        self._date[lo:hi] = np.array([r['date'] for r in records], dtype='datetime64[s]')
+        self._type[lo:hi] = self.types.codes(r['type'] for r in records)
+        self._brand[lo:hi] = self.brands.codes(r['brand'] for r in records)
+        self._price[lo:hi] = np.fromiter((r['price'] for r in records), dtype=np.float64, count=k)
+        self._co2[lo:hi] = np.fromiter((r['co2_impact'] for r in records), dtype=np.float64, count=k)
+        self._n = hi
+        if (np.diff(self._date[max(lo - 1, 0):hi]) < np.timedelta64(0, 's')).any():
+            self._sort()
+
+    def _sort(self) -> None:
+        order = np.argsort(self.date, kind='stable')
+        self._orders.clear()
+        for arr in self._columns():
+            arr[:self._n] = arr[:self._n][order]
+
+    # ---------- access ----------
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, key: slice) -> 'PurchaseColumns':
+        if not isinstance(key, slice):
+            raise TypeError("PurchaseColumns supports slicing only; use to_records() for rows")
+        start, stop, step = key.indices(self._n)
+        view = PurchaseColumns.__new__(PurchaseColumns)
+        view.types, view.brands = self.types, self.brands
+        view._date, view._type, view._brand, view._price, view._co2 = (
+            arr[start:stop:step] for arr in self._columns()
+        )
+        view._n = len(view._date)
+        view._orders = {}
+        return view
+
+    def _take(self, rows: np.ndarray) -> 'PurchaseColumns':
+        taken = PurchaseColumns.__new__(PurchaseColumns)
+        taken.types, taken.brands = self.types, self.brands
+        taken._date, taken._type, taken._brand, taken._price, taken._co2 = (
+            arr[:self._n][rows] for arr in self._columns()
+        )
+        taken._n = len(rows)
+        taken._orders = {}
+        return taken
+
+    def between(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> 'PurchaseColumns':
+        """View of the purchases with `start <= date < end` (either bound optional). O(log n)."""
+        lo = 0 if start is None else int(np.searchsorted(self.date, to_datetime64(start), side='left'))
+        hi = self._n if end is None else int(np.searchsorted(self.date, to_datetime64(end), side='left'))
+        return self[lo:max(lo, hi)]
+
+    def order(self, key: str) -> Optional[np.ndarray]:
+        """
+        Row indices in ascending `key` order, ties by date; None for 'date',
+        which is the storage order. Sorted once, then cached until the next write.
+        """
+        if key not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key {key!r} (expected one of: {', '.join(SORT_KEYS)})")
+        if key == 'date':
+            return None
+        order = self._orders.get(key)
+        if order is None:
+            order = self._orders[key] = np.argsort(getattr(self, key), kind='stable')
+        return order
+
+    def page(self, number: int, size: int, key: str = 'date', descending: bool = True) -> List[Dict]:
+        """Records of page `number` (0-based) of `size` rows sorted by `key`. O(size) after the first sort."""
+        n, lo = self._n, number * size
+        hi = min(lo + size, n)
+        if lo >= hi:
+            return []
+        start, stop = (n - hi, n - lo) if descending else (lo, hi)
+        order = self.order(key)
+        rows = self[start:stop] if order is None else self._take(order[start:stop])
+        records = rows.to_records()
+        return records[::-1] if descending else records
+
+    @property
+    def date(self) -> np.ndarray:
+        return self._date[:self._n]
+
+    @property
+    def type_code(self) -> np.ndarray:
+        return self._type[:self._n]
+
+    @property
+    def brand_code(self) -> np.ndarray:
+        return self._brand[:self._n]
+
+    @property
+    def price(self) -> np.ndarray:
+        return self._price[:self._n]
+
+    @property
+    def co2_impact(self) -> np.ndarray:
+        return self._co2[:self._n]
+
+    def aggregates(self) -> ImpactAggregates:
+        """Totals of these purchases (no per-category/brand/month breakdowns). O(len)."""
+        eco = np.fromiter((t in ECO_FRIENDLY_CATEGORIES for t in self.types.values), dtype=bool,
+                          count=len(self.types.values))
+        return ImpactAggregates({
+            'count': self._n,
+            'total_spend': float(self.price.sum()),
+            'total_co2': float(self.co2_impact.sum()),
+            'eco_count': int(eco[self.type_code].sum()),
+        })
+
+    def rescore(self) -> None:
+        """Recompute every `co2_impact` from the current factor table (one gather + multiply)."""
+        factors = co2_factors(self.types.values)
+        self._orders.pop('co2_impact', None)
+        self._co2[:self._n] = self.price * factors[self.type_code] / 100
+
+    def to_frame(self) -> 'pd.DataFrame':
+        """
+        DataFrame with columns date/type/brand/price/co2_impact. Numeric and
+        date columns share memory with this store; type/brand are Categoricals
+        over the vocabularies. Treat the frame as read-only.
+        """
+        import pandas as pd
+
+        return pd.DataFrame({
+            'date': self.date,
+            'type': pd.Categorical.from_codes(self.type_code, categories=self.types.values),
+            'brand': pd.Categorical.from_codes(self.brand_code, categories=self.brands.values),
+            'price': self.price,
+            'co2_impact': self.co2_impact,
+        }, copy=False)
+
+    def to_records(self) -> List[Dict]:
+        dates = np.datetime_as_string(self.date, unit='m')
+        return [
+            {
+                'date': d.replace('T', ' '),
+                'type': self.types.values[t],
+                'brand': self.brands.values[b],
+                'price': float(p),
+                'co2_impact': float(c),
+            }
+            for d, t, b, p, c in zip(dates, self.type_code.tolist(), self.brand_code.tolist(),
+                                     self.price.tolist(), self.co2_impact.tolist())
+        ]
@@ -0,0 +1,157 @@
+"""
+ShopImpact - Ranking
+Where a user's monthly spend and CO₂ rank among all users: every user's
+monthly totals, bucketed into log-spaced histograms per month that support
+replacing a value, so ranks are answered without scanning any history.
+"""
+
+import logging
+import math
+import threading
+from typing import Dict, Optional, Set, Tuple
+
+from shopimpact.storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('spend', 'co2')
+
+class LogHistogram:
+    """
+    Counts of non-negative values in log-spaced buckets: a value is stored
+    as its bucket, within `accuracy` relative error (values below `floor`
+    share bucket 0). Buckets live in a Fenwick tree of fixed size, so
+    add/remove and "how many are above x" cost O(log buckets) whatever the
+    number of values.
+    """
+
+    def __init__(self, accuracy: float = 0.01, floor: float = 0.01, ceiling: float = 1e10):
+        self._log_gamma = math.log((1 + accuracy) / (1 - accuracy))
+        self._floor = floor
+        self.size = self._bucket(ceiling) + 1
+        self._tree = [0] * (self.size + 1)
+        self.total = 0
+
+    def _bucket(self, value: float) -> int:
+        if value < self._floor:
+            return 0
+        return 1 + int(math.log(value / self._floor) / self._log_gamma)
+
+    def bucket(self, value: float) -> int:
+        return min(self._bucket(value), self.size - 1)
+
+    def add(self, value: float, count: int = 1) -> None:
+        i = self.bucket(value) + 1
+        while i <= self.size:
+            self._tree[i] += count
+            i += i & -i
+        self.total += count
+
+    def remove(self, value: float) -> None:
+        self.add(value, -1)
+
+    def count_at_most(self, value: float) -> int:
+        """Values in `value`'s bucket or below."""
+        i, n = self.bucket(value) + 1, 0
+        while i > 0:
+            n += self._tree[i]
+            i -= i & -i
+        return n
+
+    def count_above(self, value: float) -> int:
+        return self.total - self.count_at_most(value)
+
+class PeerRanking:
+    """
+    One per process. Holds every user's spend and CO₂ total per month
+    ('%Y-%m') plus a `LogHistogram` per (month, metric).
+
+    `seed` reads each user's monthly rollup once (in the background, see
+    `start_seeding`); afterwards the app keeps it current with `update` when
+    a purchase is committed and `observe` when a session (re)loads a user.
+    Users written to while seeding runs keep their newer values. `rank` is
+    a couple of tree walks, independent of the number of users.
+    """
+
+    def __init__(self, accuracy: float = 0.01):
+        self.accuracy = accuracy
+        self._lock = threading.Lock()
+        self._values: Dict[str, Dict[str, Tuple[float, float]]] = {}  # month -> user -> (spend, co2)
+        self._hists: Dict[Tuple[str, str], LogHistogram] = {}
+        self._touched: Set[str] = set()  # users updated since seeding started
+        self.ready = threading.Event()
+
+    # ---------- updates ----------
+    def _set(self, user_id: str, month: str, spend: float, co2: float) -> None:
+        # Caller holds the lock.
+        users = self._values.setdefault(month, {})
+        old = users.get(user_id)
+        for i, metric in enumerate(METRICS):
+            hist = self._hists.get((month, metric))
+            if hist is None:
+                hist = self._hists[(month, metric)] = LogHistogram(self.accuracy)
+            if old is not None:
+                hist.remove(old[i])
+            hist.add((spend, co2)[i])
+        users[user_id] = (spend, co2)
+
+    def _drop(self, user_id: str, month: str) -> None:
+        old = self._values.get(month, {}).pop(user_id, None)
+        if old is not None:
+            for i, metric in enumerate(METRICS):
+                self._hists[(month, metric)].remove(old[i])
+
+    def update(self, user_id: str, month: str, totals: Dict) -> None:
+        """`user_id`'s totals for `month` are now `totals` (an `ImpactAggregates.by_month` row)."""
+        with self._lock:
+            self._touched.add(user_id)
+            self._set(user_id, month, totals.get('spend', 0.0), totals.get('co2', 0.0))
+
+    def observe(self, user_id: str, by_month: Dict[str, Dict], seeding: bool = False) -> None:
+        """Replace everything known about `user_id` with its full monthly rollup."""
+        with self._lock:
+            if seeding:
+                if user_id in self._touched:
+                    return  # the app has newer totals than the seed read
+            else:
+                self._touched.add(user_id)
+            for month in [m for m, users in self._values.items() if user_id in users and m not in by_month]:
+                self._drop(user_id, month)
+            for month, row in by_month.items():
+                self._set(user_id, month, row.get('spend', 0.0), row.get('co2', 0.0))
+
+    # ---------- seeding ----------
+    def seed(self, store: StorageBackend) -> None:
+        """Read every stored user's monthly rollup. One pass over the users, then `ready` is set."""
+        try:
+            for user_id in store.users():
+                try:
+                    self.observe(user_id, store.summary(user_id).get('by_month', {}), seeding=True)
+                except Exception:
+                    logger.exception("Skipping %r while seeding peer ranking", user_id)
+        finally:
+            self.ready.set()
+
+    def start_seeding(self, store: StorageBackend) -> None:
+        threading.Thread(target=self.seed, args=(store,), name="shopimpact-ranking-seed", daemon=True).start()
+
+    # ---------- queries ----------
+    def rank(self, user_id: str, month: str, metric: str) -> Optional[Tuple[float, int]]:
+        """
+        (share of the other users active in `month` whose `metric` is higher
+        than `user_id`'s, number of those other users), or None if the user
+        has no purchases that month or nobody else does.
+        """
+        with self._lock:
+            mine = self._values.get(month, {}).get(user_id)
+            if mine is None:
+                return None
+            hist = self._hists[(month, metric)]
+            others = hist.total - 1
+            if others <= 0:
+                return None
+            return hist.count_above(mine[METRICS.index(metric)]) / others, others
+
+    def users(self, month: str) -> int:
+        with self._lock:
+            return len(self._values.get(month, {}))
@@ -0,0 +1,198 @@
+"""
+ShopImpact - Report
+Headless impact reports for many users at once: totals, per-category
+breakdown, badge eligibility and monthly goal status per user, computed in
+a process pool and written as aggregated JSON and/or CSV.
+
+    python -m shopimpact.report shopimpact_data/ shopimpact.db --json report.json --csv report.csv
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from shopimpact.impact import BADGES, ImpactAggregates, evaluate_badges
+from shopimpact.storage import DEFAULT_USER, JournaledJsonStore, JsonDirectoryStore, SqliteStore, StorageBackend
+
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+CSV_COLUMNS = (
+    'source', 'user', 'name', 'count', 'total_spend', 'total_co2', 'eco_count', 'eco_rate',
+    'month_spend', 'monthly_budget', 'budget_status', 'month_co2', 'co2_goal', 'co2_status',
+    'badges_earned', 'badges_unclaimed', 'error',
+)
+
+# A unit of work: (backend kind, path, user id). Plain tuples so they pickle cheaply.
+Job = Tuple[str, str, str]
+
+def _store(kind: str, path: str) -> StorageBackend:
+    if kind == 'sqlite':
+        return SqliteStore(Path(path))
+    if kind == 'dir':
+        return JsonDirectoryStore(Path(path))
+    return JournaledJsonStore(Path(path))
+
+@lru_cache(maxsize=None)
+def _open(kind: str, path: str) -> StorageBackend:
+    # One store per (process, source): a worker reuses it for every user it is handed.
+    return _store(kind, path)
+
+def discover(paths: Sequence[Path]) -> List[Job]:
+    """
+    Expand inputs into per-user jobs: a directory is a JSON storage
+    directory (one user per file set), `*.db`/`*.sqlite` a SQLite database,
+    any other file a single user's JSON data file (user id = file stem).
+    """
+    jobs = []
+    for path in paths:
+        if not path.exists():
+            raise FileNotFoundError(f"No such data file or directory: {path}")
+        if path.is_dir():
+            kind = 'dir'
+        elif path.suffix in SQLITE_SUFFIXES:
+            kind = 'sqlite'
+        else:
+            jobs.append(('file', str(path), path.stem))
+            continue
+        # A throwaway store, not _open's: nothing opened here may be inherited by the workers.
+        store = _store(kind, str(path))
+        try:
+            jobs.extend((kind, str(path), user) for user in store.users())
+        finally:
+            store.close()
+    return jobs
+
+def goal_status(value: float, limit: float) -> str:
+    return 'no_goal' if limit <= 0 else 'within' if value <= limit else 'over'
+
+def user_report(job: Job, month: str) -> Dict:
+    """One user's report. Runs in a worker process; failures are reported, not raised."""
+    kind, path, user_id = job
+    row: Dict = {'source': path, 'user': user_id}
+    try:
+        store = _open(kind, path)
+        if kind == 'file':
+            user_id = DEFAULT_USER  # a single data file is addressed as the default user
+        if kind == 'sqlite':
+            summary, profile, last = store.summary(user_id), store.profile(user_id), store.recent(1, user_id)
+        else:
+            data = store.load(user_id)  # one replay of the journal instead of one per query
+            summary, profile, last = data['aggregates'], data['user_profile'], data['purchases'][-1:]
+        aggs = ImpactAggregates(summary)
+    except Exception as e:
+        row['error'] = f"{type(e).__name__}: {e}"
+        return row
+
+    earned = [b for b in profile.get('badges', []) if b in BADGES]
+    # Rules that hold right now; those not yet awarded are "unclaimed" (e.g. imported histories).
+    eligible = evaluate_badges(aggs, last[0] if last else None, ())
+    current = aggs.by_month.get(month, {})
+    month_spend, month_co2 = current.get('spend', 0.0), current.get('co2', 0.0)
+    budget, goal = float(profile.get('monthlyBudget', 0)), float(profile.get('co2Goal', 0))
+    row.update({
+        'name': profile.get('name'),
+        'count': aggs.count,
+        'total_spend': aggs.total_spend,
+        'total_co2': aggs.total_co2,
+        'eco_count': aggs.eco_count,
+        'eco_rate': aggs.eco_rate,
+        'by_category': aggs.by_category,
+        'month_spend': month_spend,
+        'monthly_budget': budget,
+        'budget_status': goal_status(month_spend, budget),
+        'month_co2': month_co2,
+        'co2_goal': goal,
+        'co2_status': goal_status(month_co2, goal),
+        'badges_earned': earned,
+        'badges_eligible': eligible,
+        'badges_unclaimed': [b for b in eligible if b not in earned],
+    })
+    return row
+
+def _run_chunk(jobs: List[Job], month: str) -> List[Dict]:
+    return [user_report(job, month) for job in jobs]
+
+def build_reports(jobs: Sequence[Job], month: str, workers: Optional[int] = None,
+                  chunk_size: int = 16) -> List[Dict]:
+    """
+    Reports for `jobs`, in order. With `workers` > 1 users are spread over a
+    process pool in chunks of `chunk_size`, so throughput grows with cores.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = [list(jobs[i:i + chunk_size]) for i in range(0, len(jobs), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        return [row for chunk in chunks for row in _run_chunk(chunk, month)]
+    # Spawned, not forked: a forked worker would share any SQLite connection the caller has open.
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)),
+                             mp_context=multiprocessing.get_context('spawn')) as pool:
+        return [row for rows in pool.map(_run_chunk, chunks, [month] * len(chunks)) for row in rows]
+
+def combine(reports: List[Dict]) -> Dict:
+    """Totals across every user that reported without error."""
+    ok = [r for r in reports if 'error' not in r]
+    categories: Dict[str, Dict] = {}
+    for r in ok:
+        for name, row in r['by_category'].items():
+            total = categories.setdefault(name, {'count': 0, 'spend': 0.0, 'co2': 0.0, 'eco_count': 0})
+            for key in total:
+                total[key] += row[key]
+    return {
+        'users': len(ok),
+        'failed': len(reports) - len(ok),
+        'count': sum(r['count'] for r in ok),
+        'total_spend': sum(r['total_spend'] for r in ok),
+        'total_co2': sum(r['total_co2'] for r in ok),
+        'eco_count': sum(r['eco_count'] for r in ok),
+        'over_budget': sum(r['budget_status'] == 'over' for r in ok),
+        'over_co2_goal': sum(r['co2_status'] == 'over' for r in ok),
+        'by_category': dict(sorted(categories.items())),
+    }
+
+def write_json(path: Path, reports: List[Dict], month: str) -> None:
+    body = {'generated': datetime.now().isoformat(timespec='seconds'), 'month': month,
+            'totals': combine(reports), 'users': reports}
+    path.write_text(json.dumps(body, indent=2))
+
+def write_csv(path: Path, reports: List[Dict]) -> None:
+    """One row per user; badge lists are joined with ';' and the category breakdown is left to the JSON."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        for r in reports:
+            writer.writerow({k: ';'.join(v) if isinstance(v, list) else v for k, v in r.items()})
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="ShopImpact batch impact reports")
+    parser.add_argument('paths', type=Path, nargs='+',
+                        help="JSON storage directories, SQLite databases (*.db) or single-user JSON data files")
+    parser.add_argument('--json', type=Path, help="Write the aggregated report as JSON")
+    parser.add_argument('--csv', type=Path, help="Write one CSV row per user")
+    parser.add_argument('--month', default=datetime.now().strftime('%Y-%m'),
+                        help="Month (YYYY-MM) for budget and CO₂ goal status (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+    if not args.json and not args.csv:
+        parser.error("nothing to write: pass --json and/or --csv")
+
+    t0 = time.perf_counter()
+    jobs = discover(args.paths)
+    reports = build_reports(jobs, args.month, args.workers)
+    if args.json:
+        write_json(args.json, reports, args.month)
+    if args.csv:
+        write_csv(args.csv, reports)
+    failed = sum('error' in r for r in reports)
+    print(f"Reported {len(reports) - failed} users ({failed} failed) in {time.perf_counter() - t0:.1f}s")
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
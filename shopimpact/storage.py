@@ -0,0 +1,920 @@
+"""
+ShopImpact - Storage
+Pluggable persistence behind `load_data_cached` / `save_data`:
+- JournaledJsonStore: snapshot + append-only journal (default)
+- SqliteStore: indexed per-user tables with aggregate and range queries
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+from shopimpact.impact import ImpactAggregates
+
+if TYPE_CHECKING:  # frames are only handed in by bulk imports; storage never builds one
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER = 'default'
+PURCHASE_COLUMNS = ('date', 'type', 'brand', 'price', 'co2_impact')
+USER_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+def check_user_id(user_id: str) -> str:
+    """User ids become file names and SQL keys; reject anything path-like."""
+    if not USER_ID_PATTERN.match(user_id):
+        raise ValueError(f"Invalid user id {user_id!r}")
+    return user_id
+
+# ==================== DEFAULTS ====================
+def get_default_data() -> Dict:
+    return {
+        'purchases': [],
+        'user_profile': {
+            'name': 'Friend',
+            'monthlyBudget': 15000,
+            'co2Goal': 50,
+            'badges': []
+        }
+    }
+
+# ==================== FILE HELPERS ====================
+@contextmanager
+def _flock(path: Path):
+    """Cross-process exclusive lock on `path` (no-op where flock is unavailable)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+def atomic_write_json(path: Path, data: Dict) -> None:
+    """Write `data` to a temp file next to `path`, fsync it, then rename over `path`."""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+def read_journal(path: Path, repair: bool = False) -> List[Dict]:
+    """
+    Read a JSON-lines journal. A torn last line (crash mid-append) is dropped
+    and, with `repair`, truncated away so later appends start on a clean line.
+    """
+    if not path.exists():
+        return []
+    with open(path, 'rb') as f:
+        raw = f.read()
+
+    records = []
+    good_end = 0
+    offset = 0
+    for line in raw.split(b'\n'):
+        end = offset + len(line) + 1
+        complete = end <= len(raw)
+        offset = end
+        if not line.strip():
+            if complete:
+                good_end = end
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            if complete:
+                logger.warning("Skipping corrupt journal record in %s", path)
+                good_end = end
+            continue
+        if not complete:
+            # Valid JSON but no newline: the write was cut before the terminator.
+            continue
+        records.append(record)
+        good_end = end
+
+    if repair and good_end < len(raw):
+        logger.warning("Truncating torn journal tail in %s (%d bytes)", path, len(raw) - good_end)
+        with open(path, 'r+b') as f:
+            f.truncate(good_end)
+    return records
+
+def _merge_badges(profile: Dict, badges: List[str]) -> None:
+    # Badges only accumulate: a session with a stale list must not drop another's unlock.
+    owned = profile.setdefault('badges', [])
+    owned.extend(b for b in badges if b not in owned)
+
+def apply_record(data: Dict, record: Dict) -> None:
+    """Fold a single journal record into an in-memory data document."""
+    op = record.get('op')
+    if op == 'add':
+        data['purchases'].extend(record.get('purchases', []))
+        _merge_badges(data['user_profile'], record.get('badges', []))
+    elif op == 'profile':
+        profile = dict(record.get('profile', {}))
+        _merge_badges(data['user_profile'], profile.pop('badges', []))
+        data['user_profile'].update(profile)
+    else:
+        logger.warning("Unknown journal op %r", op)
+
+def purchase_record(purchase: Dict, badges: Optional[List[str]] = None) -> Dict:
+    record = {'op': 'add', 'purchases': [purchase]}
+    if badges:
+        record['badges'] = badges
+    return record
+
+def profile_record(profile: Dict) -> Dict:
+    return {'op': 'profile', 'profile': profile}
+
+def last_save(ops: List[Tuple]) -> int:
+    """Index of the last ('save', data) in a write batch, or -1. Everything before it is superseded."""
+    return max((i for i, op in enumerate(ops) if op[0] == 'save'), default=-1)
+
+def fold_records(data: Dict, records: Iterable[Dict], after_seq: int) -> int:
+    """
+    Apply journal records newer than `after_seq` to `data`; returns the last
+    seq seen. Records tagged with a `txn` only take effect once the matching
+    `commit` record is reached, so a bulk import cut short by a crash is dropped.
+    """
+    last_seq = after_seq
+    open_txns: Dict[str, List[Dict]] = {}
+    for record in records:
+        seq = record.get('seq', 0)
+        if seq <= after_seq:
+            continue
+        last_seq = max(last_seq, seq)
+        txn = record.get('txn')
+        if record.get('op') == 'commit':
+            for pending in open_txns.pop(txn, []):
+                apply_record(data, pending)
+            _merge_badges(data['user_profile'], record.get('badges', []))
+        elif txn is not None:
+            open_txns.setdefault(txn, []).append(record)
+        else:
+            apply_record(data, record)
+    if open_txns:
+        logger.warning("Discarding %d uncommitted transaction(s)", len(open_txns))
+    return last_seq
+
+def attach_aggregates(data: Dict) -> Dict:
+    """
+    Bring `data['aggregates']` up to date with `data['purchases']`.
+    Purchases are append-only between full saves, so the stored aggregates
+    cover a prefix and only the tail needs folding in.
+    """
+    aggs = ImpactAggregates(data.get('aggregates'))
+    if aggs.count > len(data['purchases']):
+        aggs = ImpactAggregates()
+    for p in data['purchases'][aggs.count:]:
+        aggs.add(p)
+    data['aggregates'] = aggs.to_dict()
+    return data
+
+# ==================== BULK WRITES ====================
+class BulkWriter:
+    """
+    Handed out by `StorageBackend.bulk_append`. Call `append(frame)` per chunk
+    (a DataFrame with date/type/brand/price/co2_impact columns); set `badges`
+    before the block ends to award them in the same transaction. After a
+    clean exit `version` holds the user's new version.
+    """
+
+    def __init__(self, append: Callable[['pd.DataFrame'], None]):
+        self._append = append
+        self.count = 0
+        self.badges: List[str] = []
+        self.version: Optional[int] = None
+
+    def append(self, frame: 'pd.DataFrame') -> None:
+        if len(frame):
+            self._append(frame)
+            self.count += len(frame)
+
+def frame_records(frame: 'pd.DataFrame') -> List[Dict]:
+    return frame[list(PURCHASE_COLUMNS)].to_dict('records')
+
+# ==================== BACKEND INTERFACE ====================
+class StorageBackend(ABC):
+    """
+    Everything the app persists goes through these methods.
+    Query methods have scan-based defaults; indexed backends override them.
+    Dates are the app's `%Y-%m-%d %H:%M` strings, which sort chronologically.
+
+    Every write returns the user's new version. Versions increase by one per
+    write, so a session can tell whether anyone else wrote since it loaded.
+    Profile writes merge fields; badges are only ever added. Badges earned by
+    a purchase are passed to `append_purchase` and land in the same write.
+    """
+
+    @abstractmethod
+    def load(self, user_id: str = DEFAULT_USER) -> Dict:
+        ...
+
+    @abstractmethod
+    def version(self, user_id: str = DEFAULT_USER) -> int:
+        ...
+
+    @abstractmethod
+    def save(self, data: Dict, user_id: str = DEFAULT_USER) -> int:
+        ...
+
+    @abstractmethod
+    def append_purchase(self, purchase: Dict, user_id: str = DEFAULT_USER, badges: Optional[List[str]] = None) -> int:
+        ...
+
+    @abstractmethod
+    def update_profile(self, profile: Dict, user_id: str = DEFAULT_USER) -> int:
+        ...
+
+    @abstractmethod
+    def bulk_append(self, user_id: str = DEFAULT_USER) -> Iterator[BulkWriter]:
+        """Context manager: every chunk appended inside the block commits atomically, or none does."""
+        ...
+
+    def apply_batch(self, ops: List[Tuple], user_id: str = DEFAULT_USER) -> int:
+        """
+        Apply queued writes in order: ('add', purchase, badges),
+        ('profile', profile) and ('save', data). The version advances by one
+        per op, as if each had been written on its own. Backends override this
+        to make the batch one durable write.
+        """
+        version = self.version(user_id)
+        for op in ops:
+            if op[0] == 'add':
+                version = self.append_purchase(op[1], user_id, badges=op[2])
+            elif op[0] == 'profile':
+                version = self.update_profile(op[1], user_id)
+            else:
+                version = self.save(op[1], user_id)
+        return version
+
+    @abstractmethod
+    def users(self) -> List[str]:
+        """Every user id with stored data, sorted."""
+        ...
+
+    def summary(self, user_id: str = DEFAULT_USER) -> Dict:
+        """The user's `ImpactAggregates`, as a dict."""
+        return self.load(user_id)['aggregates']
+
+    def profile(self, user_id: str = DEFAULT_USER) -> Dict:
+        """The user's profile, badges included."""
+        return self.load(user_id)['user_profile']
+
+    def purchases_between(self, start: str, end: str, user_id: str = DEFAULT_USER) -> List[Dict]:
+        """Purchases with `start <= date < end`, in date order."""
+        rows = [p for p in self.load(user_id)['purchases'] if start <= p['date'] < end]
+        return sorted(rows, key=lambda p: p['date'])
+
+    def recent(self, limit: int, user_id: str = DEFAULT_USER) -> List[Dict]:
+        """The last `limit` purchases, newest first."""
+        return self.load(user_id)['purchases'][-limit:][::-1]
+
+    def iter_purchases(self, user_id: str = DEFAULT_USER, start: Optional[str] = None, end: Optional[str] = None,
+                       types: Optional[Iterable[str]] = None, chunk_size: int = 10_000) -> Iterator[List[Dict]]:
+        """
+        Purchases with `start <= date < end` (either bound optional) and, if
+        given, a type in `types`, in date order, as lists of up to
+        `chunk_size` rows. Yields nothing for no matches.
+
+        This default loads the whole history to filter and sort it, so only
+        the chunks handed out are bounded, not memory. Backends that can
+        stream in date order (SQLite) override it.
+        """
+        wanted = None if types is None else frozenset(types)
+        rows = [
+            p for p in self.load(user_id)['purchases']
+            if (start is None or p['date'] >= start) and (end is None or p['date'] < end)
+            and (wanted is None or p['type'] in wanted)
+        ]
+        rows.sort(key=lambda p: p['date'])
+        for i in range(0, len(rows), chunk_size):
+            yield rows[i:i + chunk_size]
+
+    def close(self) -> None:
+        pass
+
+# ==================== JOURNALED STORE ====================
+class JournaledJsonStore(StorageBackend):
+    """
+    Snapshot + append-only journal for one user.
+
+    - `<name>.json`        snapshot, tagged with the last folded journal `seq`
+    - `<name>.journal`     live journal, one JSON record per line
+    - `<name>.compacting`  journal being folded by a compaction
+    - `<name>.lock`        flock target; its content is the latest `seq`
+
+    Records carry a monotonically increasing `seq`, so replay skips anything
+    the snapshot already contains and an interrupted compaction is harmless.
+    The latest `seq` doubles as the document version. Writers from other
+    processes are serialized by `flock`, threads by an RLock.
+    """
+
+    def __init__(self, snapshot_path: Path, compact_every: int = 500, fsync: bool = True):
+        self.snapshot_path = Path(snapshot_path)
+        self.journal_path = self.snapshot_path.with_suffix('.journal')
+        self.compacting_path = self.snapshot_path.with_suffix('.compacting')
+        self.lock_path = self.snapshot_path.with_suffix('.lock')
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._lock_depth = 0
+        self._compact_lock = threading.Lock()
+        self._pending = 0
+        self._compactor: Optional[threading.Thread] = None
+
+    # ---------- locking ----------
+    @contextmanager
+    def _locked(self):
+        """Exclusive access to this user's files, re-entrant within a thread."""
+        with self._lock:
+            if self._lock_depth == 0:
+                self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+                self._lock_file = open(self.lock_path, 'a+')
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    # Closing the descriptor releases the flock.
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def _read_seq(self) -> Optional[int]:
+        self._lock_file.seek(0)
+        content = self._lock_file.read().strip()
+        return int(content) if content else None
+
+    def _write_seq(self, seq: int) -> None:
+        self._lock_file.seek(0)
+        self._lock_file.truncate()
+        self._lock_file.write(str(seq))
+        self._lock_file.flush()
+
+    def _current_seq(self) -> int:
+        seq = self._read_seq()
+        if seq is None:
+            # No lock file yet (fresh or pre-locking data): derive it once.
+            seq = self._replay()[1]
+            self._write_seq(seq)
+        return seq
+
+    # ---------- reading ----------
+    def _read_snapshot(self) -> Tuple[Dict, int]:
+        if not self.snapshot_path.exists():
+            return get_default_data(), 0
+        try:
+            with open(self.snapshot_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            # Never silently drop history: keep the damaged file for inspection.
+            backup = self.snapshot_path.with_name(
+                f"{self.snapshot_path.name}.corrupt-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+            )
+            logger.error("Unreadable snapshot %s (%s); moved to %s", self.snapshot_path, e, backup)
+            os.replace(self.snapshot_path, backup)
+            return get_default_data(), 0
+        default = get_default_data()
+        data.setdefault('purchases', [])
+        data.setdefault('user_profile', default['user_profile'])
+        return data, int(data.pop('seq', 0))
+
+    def exists(self) -> bool:
+        return any(p.exists() for p in (self.snapshot_path, self.journal_path, self.compacting_path))
+
+    def users(self) -> List[str]:
+        # One file set holds exactly one user's data, whatever id it is opened under.
+        return [DEFAULT_USER] if self.exists() else []
+
+    def _replay(self) -> Tuple[Dict, int]:
+        data, snapshot_seq = self._read_snapshot()
+        records = read_journal(self.compacting_path) + read_journal(self.journal_path, repair=True)
+        last_seq = fold_records(data, records, snapshot_seq)
+        return attach_aggregates(data), last_seq
+
+    def load(self, user_id: str = DEFAULT_USER) -> Dict:
+        with self._locked():
+            data, seq = self._replay()
+            if self._read_seq() is None:
+                self._write_seq(seq)
+            return data
+
+    def version(self, user_id: str = DEFAULT_USER) -> int:
+        with self._locked():
+            return self._current_seq()
+
+    # ---------- writing ----------
+    def _append(self, record: Dict) -> int:
+        return self._append_many([record])
+
+    def _append_many(self, records: List[Dict]) -> int:
+        """Journal `records` under consecutive seqs with one write and one fsync."""
+        with self._locked():
+            first = self._current_seq() + 1
+            lines = ''.join(
+                json.dumps({'seq': seq, **record}, separators=(',', ':')) + '\n'
+                for seq, record in enumerate(records, first)
+            )
+            with open(self.journal_path, 'a') as f:
+                f.write(lines)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            seq = first + len(records) - 1
+            self._write_seq(seq)
+            self._pending += len(records)
+            if self._pending >= self.compact_every:
+                self._pending = 0
+                self._compact_in_background()
+            return seq
+
+    def append_purchase(self, purchase: Dict, user_id: str = DEFAULT_USER, badges: Optional[List[str]] = None) -> int:
+        return self._append(purchase_record(purchase, badges))
+
+    def update_profile(self, profile: Dict, user_id: str = DEFAULT_USER) -> int:
+        return self._append(profile_record(profile))
+
+    def apply_batch(self, ops: List[Tuple], user_id: str = DEFAULT_USER) -> int:
+        # A save supersedes everything queued before it: one snapshot rewrite that still
+        # accounts for their versions, then the rest of the batch in one journal write.
+        cut = last_save(ops)
+        seq = self._replace(ops[cut][1], skipped=cut) if cut >= 0 else None
+        rest = [purchase_record(op[1], op[2]) if op[0] == 'add' else profile_record(op[1]) for op in ops[cut + 1:]]
+        if rest:
+            seq = self._append_many(rest)
+        return self.version() if seq is None else seq
+
+    @contextmanager
+    def bulk_append(self, user_id: str = DEFAULT_USER) -> Iterator[BulkWriter]:
+        # Chunks are journaled under a txn id as they arrive; replay ignores them
+        # until the commit record. The user lock is held throughout so a
+        # compaction can't rotate the journal mid-transaction.
+        with self._locked():
+            txn = uuid.uuid4().hex
+            writer = BulkWriter(lambda frame: self._append({'op': 'add', 'purchases': frame_records(frame), 'txn': txn}))
+            yield writer
+            writer.version = self._append({'op': 'commit', 'txn': txn, 'badges': writer.badges})
+
+    def save(self, data: Dict, user_id: str = DEFAULT_USER) -> int:
+        """Replace everything with `data` (reset, migration). Clears the journal."""
+        return self._replace(data)
+
+    def _replace(self, data: Dict, skipped: int = 0) -> int:
+        # `skipped` superseded writes still get their version numbers.
+        with self._compact_lock, _flock(self.snapshot_path.with_suffix('.compact.lock')), self._locked():
+            seq = self._current_seq() + skipped + 1
+            atomic_write_json(self.snapshot_path, {**attach_aggregates(dict(data)), 'seq': seq})
+            for path in (self.compacting_path, self.journal_path):
+                if path.exists():
+                    path.unlink()
+            self._write_seq(seq)
+            self._pending = 0
+            return seq
+
+    # ---------- compaction ----------
+    def _compact_in_background(self) -> None:
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self.compact, name="shopimpact-compactor", daemon=True)
+        self._compactor.start()
+
+    def compact(self) -> None:
+        """Fold the journal into a fresh snapshot; appends only wait for the rotation."""
+        with self._compact_lock, _flock(self.snapshot_path.with_suffix('.compact.lock')):
+            with self._locked():
+                if not self.journal_path.exists():
+                    return
+                if self.compacting_path.exists():
+                    # Leftover from an interrupted compaction: fold both in one go.
+                    with open(self.journal_path, 'rb') as src, open(self.compacting_path, 'ab') as dst:
+                        dst.write(src.read())
+                    self.journal_path.unlink()
+                else:
+                    os.replace(self.journal_path, self.compacting_path)
+
+            data, snapshot_seq = self._read_snapshot()
+            last_seq = fold_records(data, read_journal(self.compacting_path), snapshot_seq)
+            snapshot = {**attach_aggregates(data), 'seq': last_seq}
+            # Readers replay snapshot + .compacting under the user lock: swap both in one step,
+            # or a load could pair the old snapshot with a .compacting that is already gone.
+            with self._locked():
+                atomic_write_json(self.snapshot_path, snapshot)
+                self.compacting_path.unlink()
+
+class JsonDirectoryStore(StorageBackend):
+    """
+    One JournaledJsonStore per user under `root`, so sessions of different
+    users never contend. The legacy single-user v3 file seeds `DEFAULT_USER`.
+    """
+
+    def __init__(self, root: Path, legacy_file: Optional[Path] = None):
+        self.root = Path(root)
+        self.legacy_file = Path(legacy_file) if legacy_file else None
+        self._stores: Dict[str, JournaledJsonStore] = {}
+        self._stores_lock = threading.Lock()
+
+    def _store(self, user_id: str) -> JournaledJsonStore:
+        with self._stores_lock:
+            store = self._stores.get(user_id)
+            if store is None:
+                store = JournaledJsonStore(self.root / f"{check_user_id(user_id)}.json")
+                if user_id == DEFAULT_USER and self.legacy_file and not store.exists():
+                    legacy = JournaledJsonStore(self.legacy_file)
+                    if legacy.exists():
+                        store.save(legacy.load())
+                        logger.info("Imported %s as user %r", self.legacy_file, user_id)
+                self._stores[user_id] = store
+            return store
+
+    def load(self, user_id: str = DEFAULT_USER) -> Dict:
+        return self._store(user_id).load()
+
+    def users(self) -> List[str]:
+        found = {
+            p.stem for pattern in ('*.json', '*.journal', '*.compacting') for p in self.root.glob(pattern)
+            if USER_ID_PATTERN.match(p.stem)
+        }
+        if self.legacy_file and JournaledJsonStore(self.legacy_file).exists():
+            found.add(DEFAULT_USER)  # imported on first access
+        return sorted(found)
+
+    def version(self, user_id: str = DEFAULT_USER) -> int:
+        return self._store(user_id).version()
+
+    def save(self, data: Dict, user_id: str = DEFAULT_USER) -> int:
+        return self._store(user_id).save(data)
+
+    def append_purchase(self, purchase: Dict, user_id: str = DEFAULT_USER, badges: Optional[List[str]] = None) -> int:
+        return self._store(user_id).append_purchase(purchase, badges=badges)
+
+    def update_profile(self, profile: Dict, user_id: str = DEFAULT_USER) -> int:
+        return self._store(user_id).update_profile(profile)
+
+    def bulk_append(self, user_id: str = DEFAULT_USER) -> Iterator[BulkWriter]:
+        return self._store(user_id).bulk_append()
+
+    def apply_batch(self, ops: List[Tuple], user_id: str = DEFAULT_USER) -> int:
+        return self._store(user_id).apply_batch(ops)
+
+    def iter_purchases(self, user_id: str = DEFAULT_USER, start: Optional[str] = None, end: Optional[str] = None,
+                       types: Optional[Iterable[str]] = None, chunk_size: int = 10_000) -> Iterator[List[Dict]]:
+        return self._store(user_id).iter_purchases(start=start, end=end, types=types, chunk_size=chunk_size)
+
+# ==================== SQLITE STORE ====================
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS purchases (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    user        TEXT NOT NULL,
+    date        TEXT NOT NULL,
+    type        TEXT NOT NULL,
+    brand       TEXT NOT NULL,
+    price       REAL NOT NULL,
+    co2_impact  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_purchases_user_date ON purchases (user, date);
+CREATE INDEX IF NOT EXISTS idx_purchases_user_type ON purchases (user, type);
+
+CREATE TABLE IF NOT EXISTS profiles (
+    user     TEXT PRIMARY KEY,
+    profile  TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS badges (
+    user      TEXT NOT NULL,
+    badge_id  TEXT NOT NULL,
+    PRIMARY KEY (user, badge_id)
+);
+
+CREATE TABLE IF NOT EXISTS aggregates (
+    user  TEXT PRIMARY KEY,
+    data  TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS versions (
+    user     TEXT PRIMARY KEY,
+    version  INTEGER NOT NULL
+);
+"""
+
+class SqliteStore(StorageBackend):
+    """
+    SQLite in WAL mode, one connection per thread (Streamlit runs each
+    session on its own thread). Badges live in their own table so awarding
+    one is an insert, never a rewrite of the profile.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SQLITE_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _load_profile(self, conn: sqlite3.Connection, user_id: str) -> Dict:
+        row = conn.execute('SELECT profile FROM profiles WHERE user = ?', (user_id,)).fetchone()
+        profile = json.loads(row['profile']) if row else get_default_data()['user_profile']
+        profile['badges'] = [
+            r['badge_id'] for r in
+            conn.execute('SELECT badge_id FROM badges WHERE user = ? ORDER BY rowid', (user_id,))
+        ]
+        return profile
+
+    def load(self, user_id: str = DEFAULT_USER) -> Dict:
+        conn = self._conn()
+        # One read transaction so purchases and profile come from the same WAL snapshot.
+        with conn:
+            conn.execute('BEGIN')
+            rows = conn.execute(
+                'SELECT date, type, brand, price, co2_impact FROM purchases WHERE user = ? ORDER BY id',
+                (user_id,),
+            )
+            data = {
+                'purchases': [dict(r) for r in rows],
+                'user_profile': self._load_profile(conn, user_id),
+            }
+            row = conn.execute('SELECT data FROM aggregates WHERE user = ?', (user_id,)).fetchone()
+            if row:
+                data['aggregates'] = json.loads(row['data'])
+        return attach_aggregates(data)
+
+    def _write_aggregates(self, conn: sqlite3.Connection, aggs: ImpactAggregates, user_id: str) -> None:
+        conn.execute(
+            'INSERT INTO aggregates (user, data) VALUES (?, ?) '
+            'ON CONFLICT(user) DO UPDATE SET data = excluded.data',
+            (user_id, json.dumps(aggs.to_dict())),
+        )
+
+    def _read_aggregates(self, conn: sqlite3.Connection, user_id: str) -> ImpactAggregates:
+        row = conn.execute('SELECT data FROM aggregates WHERE user = ?', (user_id,)).fetchone()
+        if row:
+            return ImpactAggregates(json.loads(row['data']))
+        # Database written before aggregates existed: rebuild once.
+        rows = conn.execute(
+            'SELECT date, type, brand, price, co2_impact FROM purchases WHERE user = ? ORDER BY id',
+            (user_id,),
+        )
+        return ImpactAggregates.from_purchases(dict(r) for r in rows)
+
+    def users(self) -> List[str]:
+        # Every write bumps the user's version, so this table lists everyone who has data.
+        return [r['user'] for r in self._conn().execute('SELECT user FROM versions ORDER BY user')]
+
+    def profile(self, user_id: str = DEFAULT_USER) -> Dict:
+        return self._load_profile(self._conn(), user_id)
+
+    def version(self, user_id: str = DEFAULT_USER) -> int:
+        row = self._conn().execute('SELECT version FROM versions WHERE user = ?', (user_id,)).fetchone()
+        return row['version'] if row else 0
+
+    def _bump_version(self, conn: sqlite3.Connection, user_id: str, by: int = 1) -> int:
+        conn.execute(
+            'INSERT INTO versions (user, version) VALUES (?, ?) '
+            'ON CONFLICT(user) DO UPDATE SET version = version + excluded.version',
+            (user_id, by),
+        )
+        return conn.execute('SELECT version FROM versions WHERE user = ?', (user_id,)).fetchone()['version']
+
+    def _write_profile(self, conn: sqlite3.Connection, profile: Dict, user_id: str) -> None:
+        badges = profile.get('badges')
+        fields = {k: v for k, v in profile.items() if k != 'badges'}
+        if fields:
+            current = self._load_profile(conn, user_id)
+            current.pop('badges')
+            current.update(fields)
+            conn.execute(
+                'INSERT INTO profiles (user, profile) VALUES (?, ?) '
+                'ON CONFLICT(user) DO UPDATE SET profile = excluded.profile',
+                (user_id, json.dumps(current)),
+            )
+        if badges:
+            conn.executemany(
+                'INSERT OR IGNORE INTO badges (user, badge_id) VALUES (?, ?)',
+                [(user_id, b) for b in badges],
+            )
+
+    def _replace(self, conn: sqlite3.Connection, data: Dict, user_id: str) -> None:
+        conn.execute('DELETE FROM purchases WHERE user = ?', (user_id,))
+        conn.execute('DELETE FROM profiles WHERE user = ?', (user_id,))
+        conn.execute('DELETE FROM badges WHERE user = ?', (user_id,))
+        conn.executemany(
+            'INSERT INTO purchases (user, date, type, brand, price, co2_impact) VALUES (?, ?, ?, ?, ?, ?)',
+            [(user_id, *(p[c] for c in PURCHASE_COLUMNS)) for p in data.get('purchases', [])],
+        )
+        self._write_profile(conn, data.get('user_profile', get_default_data()['user_profile']), user_id)
+        self._write_aggregates(conn, ImpactAggregates.from_purchases(data.get('purchases', [])), user_id)
+
+    def save(self, data: Dict, user_id: str = DEFAULT_USER) -> int:
+        with self._conn() as conn:
+            self._replace(conn, data, user_id)
+            return self._bump_version(conn, user_id)
+
+    def append_purchase(self, purchase: Dict, user_id: str = DEFAULT_USER, badges: Optional[List[str]] = None) -> int:
+        with self._conn() as conn:
+            conn.execute('BEGIN IMMEDIATE')  # read-modify-write of the aggregates row
+            aggs = self._read_aggregates(conn, user_id)
+            conn.execute(
+                'INSERT INTO purchases (user, date, type, brand, price, co2_impact) VALUES (?, ?, ?, ?, ?, ?)',
+                (user_id, *(purchase[c] for c in PURCHASE_COLUMNS)),
+            )
+            aggs.add(purchase)
+            self._write_aggregates(conn, aggs, user_id)
+            if badges:
+                self._write_profile(conn, {'badges': badges}, user_id)
+            return self._bump_version(conn, user_id)
+
+    def update_profile(self, profile: Dict, user_id: str = DEFAULT_USER) -> int:
+        with self._conn() as conn:
+            self._write_profile(conn, profile, user_id)
+            return self._bump_version(conn, user_id)
+
+    def apply_batch(self, ops: List[Tuple], user_id: str = DEFAULT_USER) -> int:
+        # One transaction; a save supersedes everything queued before it.
+        cut = last_save(ops)
+        with self._conn() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            if cut >= 0:
+                self._replace(conn, ops[cut][1], user_id)
+            aggs = self._read_aggregates(conn, user_id)
+            for op in ops[cut + 1:]:
+                if op[0] == 'add':
+                    conn.execute(
+                        'INSERT INTO purchases (user, date, type, brand, price, co2_impact) VALUES (?, ?, ?, ?, ?, ?)',
+                        (user_id, *(op[1][c] for c in PURCHASE_COLUMNS)),
+                    )
+                    aggs.add(op[1])
+                    if op[2]:
+                        self._write_profile(conn, {'badges': op[2]}, user_id)
+                else:
+                    self._write_profile(conn, op[1], user_id)
+            self._write_aggregates(conn, aggs, user_id)
+            return self._bump_version(conn, user_id, by=len(ops))
+
+    @contextmanager
+    def bulk_append(self, user_id: str = DEFAULT_USER) -> Iterator[BulkWriter]:
+        # BEGIN IMMEDIATE takes the database-wide write lock, and an import of millions of rows
+        # would hold it past other connections' busy timeout. Chunks are staged in a TEMP table
+        # instead (this connection's own database, no lock on the shared one) and copied over in
+        # one short transaction at the end; an exception before then writes nothing.
+        conn = self._conn()
+        with conn:
+            conn.execute('CREATE TEMP TABLE IF NOT EXISTS staged_purchases '
+                         '(date TEXT, type TEXT, brand TEXT, price REAL, co2_impact REAL)')
+            conn.execute('DELETE FROM temp.staged_purchases')
+        staged = ImpactAggregates()
+
+        def append(frame: 'pd.DataFrame') -> None:
+            columns = [frame[c].tolist() for c in PURCHASE_COLUMNS]
+            with conn:
+                conn.executemany(
+                    'INSERT INTO temp.staged_purchases (date, type, brand, price, co2_impact) VALUES (?, ?, ?, ?, ?)',
+                    zip(*columns),
+                )
+            staged.add_frame(frame)
+
+        writer = BulkWriter(append)
+        try:
+            yield writer
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                aggs = self._read_aggregates(conn, user_id)  # before the copy: it may rebuild from purchases
+                aggs.merge(staged)
+                conn.execute(
+                    'INSERT INTO purchases (user, date, type, brand, price, co2_impact) '
+                    'SELECT ?, date, type, brand, price, co2_impact FROM temp.staged_purchases ORDER BY rowid',
+                    (user_id,),
+                )
+                self._write_aggregates(conn, aggs, user_id)
+                if writer.badges:
+                    self._write_profile(conn, {'badges': writer.badges}, user_id)
+                writer.version = self._bump_version(conn, user_id)
+        finally:
+            with conn:
+                conn.execute('DROP TABLE IF EXISTS temp.staged_purchases')
+
+    def summary(self, user_id: str = DEFAULT_USER) -> Dict:
+        return self._read_aggregates(self._conn(), user_id).to_dict()
+
+    def purchases_between(self, start: str, end: str, user_id: str = DEFAULT_USER) -> List[Dict]:
+        rows = self._conn().execute(
+            'SELECT date, type, brand, price, co2_impact FROM purchases '
+            'WHERE user = ? AND date >= ? AND date < ? ORDER BY date, id',
+            (user_id, start, end),
+        )
+        return [dict(r) for r in rows]
+
+    def recent(self, limit: int, user_id: str = DEFAULT_USER) -> List[Dict]:
+        rows = self._conn().execute(
+            'SELECT date, type, brand, price, co2_impact FROM purchases '
+            'WHERE user = ? ORDER BY id DESC LIMIT ?',
+            (user_id, limit),
+        )
+        return [dict(r) for r in rows]
+
+    def iter_purchases(self, user_id: str = DEFAULT_USER, start: Optional[str] = None, end: Optional[str] = None,
+                       types: Optional[Iterable[str]] = None, chunk_size: int = 10_000) -> Iterator[List[Dict]]:
+        # A private read-only connection: its WAL snapshot stays consistent for the whole
+        # export without holding up writers, however slowly the consumer drains it.
+        where, params = ['user = ?'], [user_id]
+        if start is not None:
+            where.append('date >= ?')
+            params.append(start)
+        if end is not None:
+            where.append('date < ?')
+            params.append(end)
+        if types is not None:
+            types = list(types)
+            where.append(f"type IN ({', '.join('?' * len(types))})" if types else '0')
+            params.extend(types)
+        conn = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute('BEGIN')
+            cursor = conn.execute(
+                'SELECT date, type, brand, price, co2_impact FROM purchases '
+                f"WHERE {' AND '.join(where)} ORDER BY date, id",
+                params,
+            )
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [dict(r) for r in rows]
+        finally:
+            conn.close()
+
+    def close(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+# ==================== FACTORY & MIGRATION ====================
+def open_storage(kind: str, data_dir: Path, db_path: Path, legacy_file: Optional[Path] = None) -> StorageBackend:
+    """
+    Build the configured backend. `kind` is 'json' (default, one journaled
+    file set per user under `data_dir`) or 'sqlite'. `legacy_file` is the
+    single-user v3 JSON file, imported as `DEFAULT_USER` on first use.
+    """
+    if kind == 'sqlite':
+        first_open = not Path(db_path).exists()
+        store = SqliteStore(db_path)
+        if first_open and legacy_file and JournaledJsonStore(legacy_file).exists():
+            migrate_json_to_sqlite(legacy_file, store)
+        return store
+    if kind != 'json':
+        raise ValueError(f"Unknown storage backend {kind!r} (expected 'json' or 'sqlite')")
+    return JsonDirectoryStore(data_dir, legacy_file)
+
+def migrate_json_to_sqlite(json_path: Path, store: SqliteStore, user_id: str = DEFAULT_USER) -> int:
+    """One-shot import of a v3 JSON file (snapshot + journal) into SQLite. Returns the purchase count."""
+    data = JournaledJsonStore(json_path).load()
+    store.save(data, user_id)
+    logger.info("Migrated %d purchases from %s to %s", len(data['purchases']), json_path, store.db_path)
+    return len(data['purchases'])
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="ShopImpact storage tools")
+    sub = parser.add_subparsers(dest='command', required=True)
+    migrate = sub.add_parser('migrate', help="Copy a v3 JSON data file into a SQLite database")
+    migrate.add_argument('json_path', type=Path)
+    migrate.add_argument('db_path', type=Path)
+    migrate.add_argument('--user', default=DEFAULT_USER)
+    args = parser.parse_args(argv)
+
+    if args.command == 'migrate':
+        count = migrate_json_to_sqlite(args.json_path, SqliteStore(args.db_path), args.user)
+        print(f"Migrated {count} purchases into {args.db_path}")
+
+if __name__ == '__main__':
+    main()
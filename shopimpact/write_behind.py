@@ -0,0 +1,253 @@
+"""
+ShopImpact - Write-behind
+A per-process wrapper that takes storage writes off the script thread:
+writes are queued per user and a background thread flushes each queue as
+one batch (one fsync / one transaction) shortly after its first write.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from shopimpact.storage import DEFAULT_USER, BulkWriter, StorageBackend
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY = 1.0  # seconds before a failed flush is retried
+
+class _Queue:
+    """One user's writes that haven't reached the backend yet."""
+
+    __slots__ = ('ops', 'base', 'inflight', 'due')
+
+    def __init__(self, base: int):
+        self.ops: List[Tuple] = []
+        self.base = base      # backend version the queued writes build on
+        self.inflight = 0     # writes handed to the backend, not yet acknowledged
+        self.due: Optional[float] = None  # monotonic deadline of the next flush
+
+    @property
+    def idle(self) -> bool:
+        return not self.ops and not self.inflight
+
+    @property
+    def version(self) -> int:
+        return self.base + self.inflight + len(self.ops)
+
+class WriteBehindStore(StorageBackend):
+    """
+    Wraps another backend so `append_purchase`, `update_profile` and `save`
+    return without waiting for the disk.
+
+    A write is queued and returns the version it will have once stored, so
+    version checks work as before. A user's queue is flushed with
+    `apply_batch` `debounce` seconds after its first write, or at once when it
+    holds `max_pending` writes. Reads flush the user first, so they always see
+    queued writes; `version` doesn't read, it counts them. `flush()` writes
+    everything out now; `close()` (also run at exit) flushes and stops the
+    thread. A crash can lose at most the last `debounce` seconds of writes.
+
+    Only one process may write through a WriteBehindStore. A queued write's
+    version is counted from the version stored when the queue started, so
+    if another process writes the same user before the flush, two sessions
+    can be told the same version for different data. Deployments with
+    several server processes must write synchronously (no wrapper).
+    The flusher logs a warning when it sees this happen.
+
+    A failed flush keeps the writes queued and retries them. Until one
+    succeeds, `failure(user_id)` describes the error, and reads return what
+    is stored without raising. Callers must check `failure` to tell whether
+    the data they read is missing queued writes.
+    """
+
+    def __init__(self, backend: StorageBackend, debounce: float = 0.25, max_pending: int = 64):
+        self.backend = backend
+        self.debounce = debounce
+        self.max_pending = max_pending
+        self._cond = threading.Condition()
+        self._queues: Dict[str, _Queue] = {}
+        self._flush_locks: Dict[str, threading.Lock] = {}
+        self._failures: Dict[str, str] = {}  # user -> last flush error, until a flush succeeds
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="shopimpact-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ---------- queueing ----------
+    def _enqueue(self, user_id: str, op: Tuple) -> int:
+        stored = None
+        while True:
+            with self._cond:
+                if self._closed:  # after shutdown, write through
+                    break
+                q = self._queues.get(user_id)
+                if stored is not None or (q is not None and not q.idle):
+                    if q is None or q.idle:
+                        # Nothing pending: build on what is stored now, which may include other processes' writes.
+                        q = self._queues[user_id] = _Queue(stored)
+                    q.ops.append(op)
+                    now = time.monotonic()
+                    if q.due is None:
+                        q.due = now + self.debounce
+                    if len(q.ops) >= self.max_pending:
+                        q.due = now
+                    self._cond.notify()
+                    return q.version
+            stored = self.backend.version(user_id)  # outside the lock: it may touch the disk
+        return self.backend.apply_batch([op], user_id)
+
+    def append_purchase(self, purchase: Dict, user_id: str = DEFAULT_USER, badges: Optional[List[str]] = None) -> int:
+        return self._enqueue(user_id, ('add', dict(purchase), list(badges or ())))
+
+    def update_profile(self, profile: Dict, user_id: str = DEFAULT_USER) -> int:
+        return self._enqueue(user_id, ('profile', copy.deepcopy(profile)))
+
+    def save(self, data: Dict, user_id: str = DEFAULT_USER) -> int:
+        return self._enqueue(user_id, ('save', copy.deepcopy(data)))
+
+    def version(self, user_id: str = DEFAULT_USER) -> int:
+        with self._cond:
+            q = self._queues.get(user_id)
+            if q is not None and not q.idle:
+                return q.version
+        return self.backend.version(user_id)
+
+    # ---------- flushing ----------
+    def _flush_lock(self, user_id: str) -> threading.Lock:
+        with self._cond:
+            return self._flush_locks.setdefault(user_id, threading.Lock())
+
+    def _flush_user(self, user_id: str, raise_errors: bool = False) -> None:
+        # The per-user lock keeps batches in order and makes flush() wait for one already running.
+        with self._flush_lock(user_id):
+            with self._cond:
+                q = self._queues.get(user_id)
+                if q is None or not q.ops:
+                    return
+                ops, q.ops, q.due = q.ops, [], None
+                q.inflight = len(ops)
+            try:
+                version = self.backend.apply_batch(ops, user_id)
+            except Exception as e:
+                with self._cond:
+                    # Keep the writes, ahead of anything queued meanwhile, and try again later.
+                    q.ops[:0] = ops
+                    q.inflight = 0
+                    q.due = time.monotonic() + RETRY_DELAY
+                    self._failures[user_id] = f"{type(e).__name__}: {e}"
+                    self._cond.notify()
+                if raise_errors:
+                    raise
+                logger.exception("Write-behind flush of %d writes for %r failed; retrying", len(ops), user_id)
+                return
+            if version != q.base + len(ops):
+                logger.warning("Another process wrote %r while %d writes were queued here (stored version %d, "
+                               "expected %d); write-behind is single-process only, set "
+                               "SHOPIMPACT_WRITE_DEBOUNCE=0", user_id, len(ops), version, q.base + len(ops))
+            with self._cond:
+                q.base, q.inflight = version, 0
+                self._failures.pop(user_id, None)
+
+    def failure(self, user_id: str = DEFAULT_USER) -> Optional[str]:
+        """The error of `user_id`'s last flush if its writes are still waiting for a successful one."""
+        with self._cond:
+            return self._failures.get(user_id)
+
+    def _settle(self, user_id: Optional[str] = None) -> None:
+        # Reads flush first but never raise: on failure the writes stay queued and `failure` says so.
+        users = [user_id] if user_id is not None else self._users()
+        for user in users:
+            self._flush_user(user)
+
+    def _users(self) -> List[str]:
+        with self._cond:
+            return list(self._queues)
+
+    def _due(self) -> Optional[List[str]]:
+        # Called with the condition held: waits until some queue is due; None once closed.
+        while not self._closed:
+            now = time.monotonic()
+            pending = [(q.due, user) for user, q in self._queues.items() if q.ops]
+            due = [user for at, user in pending if at <= now]
+            if due:
+                return due
+            self._cond.wait(min(at for at, _ in pending) - now if pending else None)
+        return None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                due = self._due()
+            if due is None:
+                return
+            for user_id in due:
+                self._flush_user(user_id)
+
+    def flush(self, user_id: Optional[str] = None) -> None:
+        """Write out everything queued for `user_id` (or every user) before returning."""
+        for user in [user_id] if user_id is not None else self._users():
+            self._flush_user(user, raise_errors=True)
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        for user in self._users():
+            try:
+                self._flush_user(user, raise_errors=True)
+            except Exception:
+                # Last chance: put the writes in the log so they can be replayed by hand.
+                with self._cond:
+                    ops = self._queues[user].ops
+                logger.critical("Could not store %d queued writes for %r at shutdown: %s",
+                                len(ops), user, json.dumps(ops, default=str), exc_info=True)
+        self.backend.close()
+
+    # ---------- reads: flush first, so a session reads its own writes ----------
+    def load(self, user_id: str = DEFAULT_USER) -> Dict:
+        self._settle(user_id)
+        return self.backend.load(user_id)
+
+    def users(self) -> List[str]:
+        self._settle()
+        return self.backend.users()
+
+    def summary(self, user_id: str = DEFAULT_USER) -> Dict:
+        self._settle(user_id)
+        return self.backend.summary(user_id)
+
+    def profile(self, user_id: str = DEFAULT_USER) -> Dict:
+        self._settle(user_id)
+        return self.backend.profile(user_id)
+
+    def purchases_between(self, start: str, end: str, user_id: str = DEFAULT_USER) -> List[Dict]:
+        self._settle(user_id)
+        return self.backend.purchases_between(start, end, user_id)
+
+    def recent(self, limit: int, user_id: str = DEFAULT_USER) -> List[Dict]:
+        self._settle(user_id)
+        return self.backend.recent(limit, user_id)
+
+    def iter_purchases(self, user_id: str = DEFAULT_USER, start: Optional[str] = None, end: Optional[str] = None,
+                       types: Optional[Iterable[str]] = None, chunk_size: int = 10_000) -> Iterator[List[Dict]]:
+        self._settle(user_id)
+        yield from self.backend.iter_purchases(user_id, start=start, end=end, types=types, chunk_size=chunk_size)
+
+    @contextmanager
+    def bulk_append(self, user_id: str = DEFAULT_USER) -> Iterator[BulkWriter]:
+        # Imports are already one batched write; queued writes go first so order is kept.
+        self.flush(user_id)
+        with self.backend.bulk_append(user_id) as writer:
+            yield writer
+
+    def apply_batch(self, ops: List[Tuple], user_id: str = DEFAULT_USER) -> int:
+        self.flush(user_id)
+        return self.backend.apply_batch(ops, user_id)
@@ -3,16 +3,35 @@ ShopImpact - Ultimate Streamlit Edition
 Fully Optimized, Gamified, and Beautifully Animated.
 """
 
+import time
+RUN_STARTED = time.perf_counter()  # before the imports below: a cold process's first run pays for them
+
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, timedelta
-import json
+from html import escape
+import copy
+import os
 import random
-import time
+import re
+import tempfile
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import IO, TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+# pandas and plotly.express are imported on first use (charts, CSV import), so a
+# session that only logs purchases never loads them.
+from shopimpact.impact import (
+    BADGES, ECO_FRIENDLY_CATEGORIES, PRODUCT_TYPES, ImpactAggregates, evaluate_badges, score_purchase,
+)
+from shopimpact.catalog import TOP_K as CATALOG_TOP_K, get_catalog
+from shopimpact.exporter import EXPORT_FORMATS, export_purchases
+from shopimpact.instrumentation import Profiler
+from shopimpact.purchase_store import PurchaseColumns
+from shopimpact.ranking import PeerRanking
+from shopimpact.storage import DEFAULT_USER, StorageBackend, get_default_data, open_storage
+from shopimpact.write_behind import WriteBehindStore
+
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
 
 # ==================== PAGE CONFIGURATION ====================
 st.set_page_config(
@@ -23,286 +42,168 @@ st.set_page_config(
 )
 
 # ==================== ADVANCED CSS & ANIMATIONS ====================
-st.markdown("""
-<style>
-    /* --- GLOBAL THEME --- */
-    @import url('https://fonts.googleapis.com/css2?family=Nunito:wght@400;600;700;800&display=swap');
-    
-    html, body, [class*="css"] {
-        font-family: 'Nunito', sans-serif;
-        color: #000000 !important; /* FORCE BLACK TEXT */
-    }
-
-    .stApp {
-        background: linear-gradient(120deg, #e0f2f1 0%, #f1f8e9 50%, #fffde7 100%);
-        background-attachment: fixed;
-    }
-
-    /* --- TEXT VISIBILITY FIXES --- */
-    h1, h2, h3, h4, h5, h6, p, div, span, label, .stMarkdown {
-        color: #000000 !important;
-    }
-    
-    /* Make input labels black */
-    .stSelectbox label, .stNumberInput label, .stSlider label, .stTextInput label {
-        color: #000000 !important;
-        font-weight: bold;
-    }
-
-    /* --- FALLING LEAF ANIMATION --- */
-    @keyframes dropAndDry {
-        0% { transform: translateY(-10vh) rotate(0deg) translateX(0px); opacity: 0; filter: hue-rotate(0deg); }
-        10% { opacity: 1; }
-        50% { filter: hue-rotate(0deg); } /* Green */
-        80% { filter: hue-rotate(90deg) sepia(1); } /* Dried/Brown */
-        100% { transform: translateY(110vh) rotate(720deg) translateX(50px); opacity: 0; filter: hue-rotate(90deg) sepia(1); }
-    }
-
-    .leaf {
-        position: fixed;
-        top: 0;
-        left: 50%;
-        font-size: 2rem;
-        animation: dropAndDry 15s infinite linear;
-        pointer-events: none;
-        z-index: 0;
-    }
-    
-    .leaf:nth-child(1) { left: 10%; animation-duration: 12s; animation-delay: 0s; }
-    .leaf:nth-child(2) { left: 30%; animation-duration: 18s; animation-delay: 2s; font-size: 1.5rem; }
-    .leaf:nth-child(3) { left: 70%; animation-duration: 14s; animation-delay: 5s; }
-    .leaf:nth-child(4) { left: 90%; animation-duration: 20s; animation-delay: 1s; font-size: 2.5rem; }
-
-    /* --- GLASSMORPHISM CARDS --- */
-    div[data-testid="stMetric"], div[class*="stCard"] {
-        background: rgba(255, 255, 255, 0.85); /* Increased opacity for readability */
-        backdrop-filter: blur(12px);
-        -webkit-backdrop-filter: blur(12px);
-        border-radius: 20px;
-        padding: 20px;
-        box-shadow: 0 8px 32px 0 rgba(31, 38, 135, 0.07);
-        border: 1px solid rgba(255, 255, 255, 0.4);
-        transition: transform 0.3s ease, box-shadow 0.3s ease;
-    }
-
-    div[data-testid="stMetric"]:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 12px 40px 0 rgba(31, 38, 135, 0.15);
-    }
-    
-    /* --- METRIC TEXT COLOR --- */
-    [data-testid="stMetricValue"] {
-        color: #000000 !important;
-    }
-    [data-testid="stMetricLabel"] {
-        color: #333333 !important;
-    }
-
-    /* --- UI TRANSITIONS --- */
-    .element-container {
-        animation: fadeIn 0.8s ease-out;
-    }
+# The stylesheet and its bundled Nunito font live in static/. With static serving on
+# (.streamlit/config.toml), every rerun sends only an @import stub that the browser resolves once
+# and then serves from its cache; without it the stylesheet is inlined instead (and the
+# font falls back to an installed Nunito or sans-serif). Nothing is loaded from the internet.
+STYLESHEET = Path(__file__).parent / "static" / "shopimpact.css"
+
+@st.cache_resource
+def inline_stylesheet() -> str:
+    return f"<style>{STYLESHEET.read_text(encoding='utf-8')}</style>"
+
+def inject_styles() -> None:
+    if st.get_option("server.enableStaticServing"):
+        st.html("<style>@import url('app/static/shopimpact.css');</style>")
+    else:
+        st.html(inline_stylesheet())
+    st.markdown("""
+    <div class="leaf">🍃</div>
+    <div class="leaf">🍂</div>
+    <div class="leaf">🍃</div>
+    <div class="leaf">🍂</div>
+    """, unsafe_allow_html=True)
 
-    @keyframes fadeIn {
-        from { opacity: 0; transform: translateY(20px); }
-        to { opacity: 1; transform: translateY(0); }
-    }
+inject_styles()
 
-    /* --- BUTTONS --- */
-    .stButton > button {
-        background: linear-gradient(45deg, #43a047, #66bb6a);
-        color: white !important; /* Keep button text white */
-        border: none;
-        border-radius: 15px;
-        padding: 10px 25px;
-        font-weight: 700;
-        box-shadow: 0 4px 15px rgba(67, 160, 71, 0.3);
-        transition: all 0.3s ease;
-    }
-
-    .stButton > button:hover {
-        transform: scale(1.05);
-        box-shadow: 0 6px 20px rgba(67, 160, 71, 0.5);
-    }
-    
-    /* --- TABS --- */
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 10px;
-        background-color: rgba(255,255,255,0.6);
-        border-radius: 15px;
-        padding: 10px;
-    }
-
-    .stTabs [data-baseweb="tab"] {
-        height: 50px;
-        white-space: pre-wrap;
-        background-color: transparent;
-        border-radius: 10px;
-        color: #000000;
-        font-weight: 800;
-    }
-
-    .stTabs [aria-selected="true"] {
-        background-color: #fff;
-        color: #2e7d32 !important;
-        box-shadow: 0 4px 6px rgba(0,0,0,0.05);
-    }
-</style>
-<div class="leaf">🍃</div>
-<div class="leaf">🍂</div>
-<div class="leaf">🍃</div>
-<div class="leaf">🍂</div>
-""", unsafe_allow_html=True)
-
-# ==================== CONSTANTS ====================
-PRODUCT_TYPES = [
-    'Fast Fashion', 'T-Shirt', 'Jeans', 'Dress', 'Suit', 'Jacket', 'Sweater', 'Hoodie', 'Shorts', 'Skirt',
-    'Blazer', 'Coat', 'Pants', 'Leggings', 'Activewear', 'Swimwear', 'Underwear', 'Socks', 'Shoes', 'Sneakers',
-    'Electronics', 'Smartphone', 'Laptop', 'Tablet', 'Desktop Computer', 'Monitor', 'Keyboard', 'Mouse',
-    'Headphones', 'Gaming Console', 'Smartwatch', 'Camera', 'TV', 'Speaker', 'Drone',
-    'Local Groceries', 'Organic Vegetables', 'Organic Fruits', 'Meat', 'Dairy Products', 'Snacks',
-    'Home Decor', 'Sofa', 'Chair', 'Table', 'Bed', 'Mattress', 'Kitchenware', 'Appliance',
-    'Cosmetics', 'Skincare', 'Perfume', 'Hair Care', 'Personal Care',
-    'Books (New)', 'Books (Used)', 'E-book', 'Vinyl Record', 'Video Game',
-    'Yoga Mat', 'Gym Equipment', 'Bicycle', 'Sports Gear', 'Camping Gear',
-    'Car Parts', 'Tires', 'Car Accessories',
-    'Restaurant Meal', 'Fast Food', 'Coffee', 'Dessert',
-    'Leather Goods', 'Vegan Leather',
-    'Second-Hand Item', 'Thrifted Clothing', 'Used Electronics', 'Vintage Furniture', 'Refurbished Tech',
-    'Office Supplies', 'Stationery', 'Art Supplies',
-    'Gift Card', 'Subscription', 'Event Ticket', 'Digital Download', '500+ (Other)'
-]
-
-ALL_BRANDS = [
-    'Zara', 'H&M', 'Nike', 'Adidas', 'Uniqlo', 'Gucci', 'Louis Vuitton', 'Patagonia', 'The North Face', 'Levi\'s',
-    'Apple', 'Samsung', 'Sony', 'Dell', 'HP', 'Lenovo', 'Asus', 'Microsoft', 'Google', 'Canon',
-    'Whole Foods', 'Trader Joe\'s', 'Nestle', 'Coca-Cola', 'Pepsi', 'Danone', 'Beyond Meat',
-    'IKEA', 'West Elm', 'Pottery Barn', 'Ashley Furniture', 'Wayfair',
-    'Sephora', 'L\'Oreal', 'Estee Lauder', 'Mac', 'Fenty Beauty', 'The Body Shop', 'Lush',
-    'Amazon', 'Barnes & Noble', 'Penguin Random House', 'Nintendo', 'PlayStation', 'Xbox',
-    'Toyota', 'Honda', 'Ford', 'Tesla', 'BMW',
-    'Local Thrift Store', 'Goodwill', 'Salvation Army', 'Depop', 'Poshmark', 'Etsy', 'eBay',
-    'Local Farm', 'Farmers Market', 'Small Business', 'Handmade', 'Generic', 'Other'
-]
-
-# Simplified Multipliers for logic
-def get_product_multiplier(product_type: str) -> float:
-    base_multipliers = {
-        'Fast Fashion': 2.5, 'Jeans': 3.2, 'Coat': 4.2, 'Shoes': 3.0,
-        'Electronics': 1.8, 'Smartphone': 2.5, 'Laptop': 3.0, 'Desktop Computer': 3.5,
-        'Meat': 1.5, 'Dairy Products': 0.6, 'Local Groceries': 0.3, 'Organic Vegetables': 0.2,
-        'Sofa': 4.0, 'Bed': 3.5, 'Appliance': 2.0,
-        'Cosmetics': 1.5, 'Perfume': 1.5,
-        'Books (New)': 0.5, 'Books (Used)': 0.05, 'E-book': 0.02,
-        'Bicycle': 5.0, 'Car Parts': 2.0,
-        'Second-Hand Item': 0.1, 'Thrifted Clothing': 0.08, 'Used Electronics': 0.15,
-        'Digital Download': 0.02, 'Service': 0.0
-    }
-    if product_type in base_multipliers:
-        return base_multipliers[product_type]
-    elif 'Used' in product_type or 'Second-Hand' in product_type or 'Thrift' in product_type:
-        return 0.1
-    elif 'Leather' in product_type:
-        return 3.5
-    elif 'Plastic' in product_type:
-        return 2.0
+# ==================== DATA MANAGEMENT ====================
+DATA_FILE = Path("shopimpact_data_v3.json")  # legacy single-user file, imported once
+DATA_DIR = Path(os.environ.get("SHOPIMPACT_DATA_DIR", "shopimpact_data"))
+DB_FILE = Path(os.environ.get("SHOPIMPACT_DB", "shopimpact.db"))
+STORAGE_BACKEND = os.environ.get("SHOPIMPACT_STORAGE", "json")  # 'json' or 'sqlite'
+WRITE_DEBOUNCE = float(os.environ.get("SHOPIMPACT_WRITE_DEBOUNCE", "0.25"))  # seconds; 0 writes synchronously
+POINT_BUDGET = os.environ.get("SHOPIMPACT_POINT_BUDGET")  # default for Chart settings; unset = charts default
+DEBUG_PANEL = os.environ.get("SHOPIMPACT_DEBUG") == "1"  # or per session with ?debug=1
+METRICS_FILE = os.environ.get("SHOPIMPACT_METRICS_FILE")  # .json or Prometheus text, for a local scraper
+METRICS_INTERVAL = float(os.environ.get("SHOPIMPACT_METRICS_INTERVAL", "10"))  # seconds between dumps
+
+@st.cache_resource
+def get_store() -> StorageBackend:
+    # One store per process: it owns the file locks / connections and background work.
+    # Writes are queued and flushed behind the rerun, so a submit never waits on fsync.
+    # Write-behind is single-process only: multi-process deployments set SHOPIMPACT_WRITE_DEBOUNCE=0.
+    store = open_storage(STORAGE_BACKEND, DATA_DIR, DB_FILE, legacy_file=DATA_FILE)
+    return WriteBehindStore(store, debounce=WRITE_DEBOUNCE) if WRITE_DEBOUNCE > 0 else store
+
+@st.cache_resource
+def get_ranking() -> PeerRanking:
+    # Process-wide: every user's monthly totals, read once in the background, then kept current.
+    ranking = PeerRanking()
+    ranking.start_seeding(get_store())
+    return ranking
+
+@st.cache_resource
+def get_profiler() -> Profiler:
+    # Process-wide, so the rolling percentiles cover every session.
+    return Profiler()
+
+profiler = get_profiler()
+show_debug_panel = DEBUG_PANEL or st.query_params.get("debug") == "1"
+# Phases are only timed when someone looks at them; otherwise phase() is a shared no-op.
+profiler.start_run(enabled=show_debug_panel or bool(METRICS_FILE), started=RUN_STARTED)
+
+# Cached reads are keyed by (user, version), so another session's write is a cache miss, never stale.
+# Each entry is a whole pickled history and versions only go up, so an old entry is never read
+# again: keep just a few, briefly, for sessions of the same user catching up on the same write.
+@st.cache_data(max_entries=8, ttl=60)
+def load_data_cached(user_id: str, version: int) -> Dict:
+    return get_store().load(user_id)
+
+def get_user_id() -> str:
+    # `?user=<id>` partitions data per user; anything unsafe for a file name is replaced.
+    raw = st.query_params.get("user", DEFAULT_USER)
+    return re.sub(r'[^A-Za-z0-9_-]', '_', raw)[:64] or DEFAULT_USER
+
+def mark_committed(version: Optional[int]) -> None:
+    # Only advance if this write directly follows what the session has seen. Otherwise
+    # another session wrote in between (or the write failed), so this session's copy matches
+    # no stored version: drop the version so nothing is cached under it and the next run reloads.
+    seen = st.session_state.data_version
+    if version is not None and seen is not None and version == seen + 1:
+        st.session_state.data_version = version
     else:
-        return 1.0
-
-ECO_FRIENDLY_CATEGORIES = [
-    'Second-Hand Item', 'Local Groceries', 'Books (Used)', 'Thrifted Clothing',
-    'Used Electronics', 'Vintage Furniture', 'Organic Vegetables', 'Organic Fruits',
-    'Refurbished Tech', 'Bicycle', 'Vegan Leather', 'Digital Download'
-]
-
-# ==================== BADGE SYSTEM ====================
-BADGES = {
-    'first_step': {'name': '🌱 First Step', 'desc': 'Logged your first purchase', 'icon': '🌱'},
-    'thrift_king': {'name': '👑 Thrift King', 'desc': 'Bought 3 second-hand items', 'icon': '👑'},
-    'low_carbon': {'name': '🍃 Low Carbon', 'desc': 'Logged an item with < 1kg CO₂', 'icon': '🍃'},
-    'big_saver': {'name': '💰 Big Saver', 'desc': 'Spent over ₹10,000 in one go', 'icon': '💰'},
-    'eco_warrior': {'name': '🛡️ Eco Warrior', 'desc': 'Maintained < 50kg CO₂ total', 'icon': '🛡️'},
-    'consistent': {'name': '📅 Consistent', 'desc': 'Logged 5 items total', 'icon': '📅'}
-}
+        st.session_state.data_version = None
 
-# ==================== DATA MANAGEMENT ====================
-DATA_FILE = Path("shopimpact_data_v3.json")
-
-def get_default_data() -> Dict:
-    return {
-        'purchases': [],
-        'user_profile': {
-            'name': 'Friend',
-            'monthlyBudget': 15000,
-            'co2Goal': 50,
-            'badges': []
-        }
-    }
+def save_data(data: Dict) -> None:
+    try:
+        with profiler.phase("storage.write"):
+            get_store().save(data, st.session_state.user_id)
+        st.session_state.data_version = None  # reload on next run
+    except Exception as e:
+        st.error(f"Error saving data: {e}")
 
-@st.cache_data
-def load_data_cached() -> Dict:
-    if DATA_FILE.exists():
-        try:
-            with open(DATA_FILE, 'r') as f:
-                return json.load(f)
-        except Exception:
-            return get_default_data()
-    return get_default_data()
+def journal_purchase(purchase: Dict, badges: List[str]) -> None:
+    try:
+        with profiler.phase("storage.write"):
+            version = get_store().append_purchase(purchase, st.session_state.user_id, badges=badges)
+        mark_committed(version)
+    except Exception as e:
+        mark_committed(None)
+        st.error(f"Error saving data: {e}")
 
-def save_data(data: Dict) -> None:
+def save_profile(profile: Dict) -> None:
     try:
-        with open(DATA_FILE, 'w') as f:
-            json.dump(data, f, indent=2)
-        load_data_cached.clear()
+        with profiler.phase("storage.write"):
+            version = get_store().update_profile(profile, st.session_state.user_id)
+        mark_committed(version)
     except Exception as e:
+        mark_committed(None)
         st.error(f"Error saving data: {e}")
 
 # ==================== INITIALIZATION ====================
-if 'initialized' not in st.session_state:
-    data = load_data_cached()
-    st.session_state.purchases = data.get('purchases', [])
-    st.session_state.user_profile = data.get('user_profile', get_default_data()['user_profile'])
+def write_failure(user_id: str) -> Optional[str]:
+    """Why `user_id`'s queued writes haven't reached storage yet, if the last attempt failed."""
+    store = get_store()
+    return store.failure(user_id) if isinstance(store, WriteBehindStore) else None
+
+def sync_session() -> None:
+    """Load this session's copy on first run, or again when another session has written since."""
+    user_id = get_user_id()
+    failure = write_failure(user_id)
+    if failure is not None:
+        st.error(f"⚠️ Your latest changes haven't been saved yet ({failure}). They are kept and retried every second.")
+        if st.session_state.get('user_id') == user_id:
+            return  # this session's copy has the unsaved changes; storage doesn't
+    with profiler.phase("storage.version"):
+        version = get_store().version(user_id)
+    if st.session_state.get('user_id') == user_id and st.session_state.get('data_version') == version:
+        return
+    with profiler.phase("storage.load"):
+        if failure is None:
+            data = load_data_cached(user_id, version)
+        else:
+            # Storage lacks the queued writes, so this copy matches no version: cache nothing under it.
+            data, version = get_store().load(user_id), None
+    st.session_state.user_id = user_id
+    st.session_state.data_version = version
+    st.session_state.purchases = PurchaseColumns.from_records(data.get('purchases', []))
+    st.session_state.user_profile = dict(data.get('user_profile', get_default_data()['user_profile']))
     if 'badges' not in st.session_state.user_profile:
         st.session_state.user_profile['badges'] = []
-    st.session_state.initialized = True
+    st.session_state.aggregates = ImpactAggregates(data.get('aggregates'))
+    get_ranking().observe(user_id, st.session_state.aggregates.by_month)
+
+with profiler.phase("init"):
+    sync_session()
 
 # ==================== LOGIC FUNCTIONS ====================
-def check_badges():
-    purchases = st.session_state.purchases
+def check_badges(purchase: Dict) -> List[str]:
+    """Award every newly earned badge for `purchase`; the caller persists them with it."""
     my_badges = st.session_state.user_profile['badges']
-    new_badge = None
+    new_badges = evaluate_badges(st.session_state.aggregates, purchase, my_badges)
+    my_badges.extend(new_badges)
+    return new_badges
 
-    if len(purchases) >= 1 and 'first_step' not in my_badges:
-        new_badge = 'first_step'
-    
-    thrift_count = sum(1 for p in purchases if p['type'] in ECO_FRIENDLY_CATEGORIES)
-    if thrift_count >= 3 and 'thrift_king' not in my_badges:
-        new_badge = 'thrift_king'
-        
-    if purchases and purchases[-1]['co2_impact'] < 1.0 and 'low_carbon' not in my_badges:
-        new_badge = 'low_carbon'
-        
-    if purchases and purchases[-1]['price'] > 10000 and 'big_saver' not in my_badges:
-        new_badge = 'big_saver'
-
-    if len(purchases) >= 5 and 'consistent' not in my_badges:
-        new_badge = 'consistent'
-
-    if new_badge:
-        st.session_state.user_profile['badges'].append(new_badge)
-        badge_info = BADGES[new_badge]
+def celebrate(new_badges: List[str]) -> None:
+    for badge_id in new_badges:
+        badge_info = BADGES[badge_id]
         st.toast(f"🏆 BADGE UNLOCKED: {badge_info['name']}", icon=badge_info['icon'])
-        time.sleep(0.5)
+    if new_badges:
         st.balloons()
-        save_data({
-            'purchases': st.session_state.purchases,
-            'user_profile': st.session_state.user_profile
-        })
-
-def add_purchase(product_type: str, brand: str, price: float):
-    co2_impact = price * get_product_multiplier(product_type) / 100
-    if product_type in ECO_FRIENDLY_CATEGORIES:
-        co2_impact *= 0.5
+
+def add_purchase(product_type: str, brand: str, price: float) -> List[str]:
+    """Record and persist a purchase; returns the badges it earned."""
+    co2_impact = score_purchase(product_type, price)
     
     purchase = {
         'date': datetime.now().strftime('%Y-%m-%d %H:%M'),
@@ -312,157 +213,378 @@ def add_purchase(product_type: str, brand: str, price: float):
         'co2_impact': float(co2_impact)
     }
     st.session_state.purchases.append(purchase)
+    st.session_state.aggregates.add(purchase)
+    new_badges = check_badges(purchase)
     
-    save_data({
-        'purchases': st.session_state.purchases,
-        'user_profile': st.session_state.user_profile
-    })
-    check_badges()
+    journal_purchase(purchase, new_badges)
+    month = purchase['date'][:7]
+    get_ranking().update(st.session_state.user_id, month, st.session_state.aggregates.by_month[month])
+    return new_badges
 
-# ==================== MAIN UI ====================
+def import_history(source) -> None:
+    from shopimpact.importer import import_purchases_csv
 
-# HEADER
-col_h1, col_h2 = st.columns([3, 1])
-with col_h1:
-    st.markdown("# 🍃 ShopImpact")
-    st.markdown("### *Your Conscious Shopping Companion*")
-with col_h2:
-    if st.session_state.user_profile['badges']:
-        latest = st.session_state.user_profile['badges'][-1]
-        st.info(f"Latest Badge: {BADGES[latest]['icon']} {BADGES[latest]['name']}")
-    else:
-        st.info("Start shopping to earn badges!")
+    try:
+        with profiler.phase("storage.import"):
+            report = import_purchases_csv(
+                source, get_store(), st.session_state.user_id,
+                aggregates=copy.deepcopy(st.session_state.aggregates),
+                owned_badges=st.session_state.user_profile['badges'],
+            )
+    except Exception as e:
+        st.error(f"Import failed: {e}")
+        return
+    # The import bypassed this session's copy: the full rerun reloads it from storage.
+    st.session_state.data_version = None
+    st.session_state.import_errors = report.errors
+    skipped = f", skipped {report.rejected:,} invalid rows" if report.rejected else ""
+    rerun_after_write(f"Imported {report.imported:,} purchases{skipped}.", report.badges)
+
+EXPORT_SPOOL_BYTES = 8 * 1024 * 1024  # larger exports are spooled to a temp file while being written
+
+def export_history(fmt: str, start: Optional[str], end: Optional[str],
+                   types: Optional[List[str]]) -> Callable[[], IO[bytes]]:
+    """
+    The download's data callable. Streamlit runs it off the script thread when the
+    button is clicked, so session state is read here and only plain values go in.
+    """
+    store, user_id = get_store(), st.session_state.user_id
 
-st.markdown("---")
+    def build() -> IO[bytes]:
+        out = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES)
+        export_purchases(store, out, fmt, user_id, start=start, end=end, types=types)
+        out.seek(0)
+        return out
+    return build
 
-# TABS
-tab_dash, tab_analytics, tab_profile = st.tabs(["🛍️ Dashboard", "📊 Analytics", "🏆 Profile & Badges"])
+def rerun_after_write(notice: str, badges: List[str] = ()) -> None:
+    """
+    Rerun the whole app so header, metrics and charts reflect a write made inside
+    a fragment. `notice` and the badge celebration are shown on that run.
+    """
+    st.session_state.notice = notice
+    st.session_state.pending_badges = list(badges)
+    st.rerun()
+
+# ==================== CHARTS ====================
+# Figures are cached per (user, data version, chart settings), so reruns that don't change data skip
+# building them. Purchases are passed as `_purchases` (not hashed): the version identifies them.
+FIGURE_CACHE_SIZE = 32  # per chart; least recently used figures are evicted first
+
+@st.cache_resource(max_entries=FIGURE_CACHE_SIZE)
+def timeseries_figure(user_id: str, version: int, budget: int, method: str,
+                      _purchases: PurchaseColumns) -> Tuple["go.Figure", Optional[str]]:
+    import plotly.express as px
+    from shopimpact.charts import spending_timeseries
+
+    series, reduced = spending_timeseries(_purchases.to_frame(), budget, method=method)
+    fig = px.line(series, x='date', y='value', color='variable',
+                  markers=reduced is None or method == 'lttb',
+                  labels={'value': 'Amount', 'date': 'Date'},
+                  color_discrete_map={'price': '#2ecc71', 'co2_impact': '#e74c3c'})
+    fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)', 
+        plot_bgcolor='rgba(0,0,0,0)', 
+        legend_title_text='',
+        font=dict(color='black')
+    )
+    return fig, f"Showing {reduced}." if reduced else None
+
+@st.cache_resource(max_entries=FIGURE_CACHE_SIZE)
+def sunburst_figure(user_id: str, version: int, _purchases: PurchaseColumns) -> Tuple["go.Figure", Optional[str]]:
+    import plotly.express as px
+    from shopimpact.charts import sunburst_frame
+
+    fig = px.sunburst(sunburst_frame(_purchases.to_frame()), path=['type', 'brand'], values='co2_total',
+                      color='co2_impact', color_continuous_scale='RdYlGn_r',
+                      labels={'co2_total': 'CO₂ (kg)', 'co2_impact': 'CO₂ per item (kg)'})
+    fig.update_layout(paper_bgcolor='rgba(0,0,0,0)', font=dict(color='black'))
+    return fig, None
+
+@st.cache_resource(max_entries=FIGURE_CACHE_SIZE)
+def scatter_figure(user_id: str, version: int, budget: int,
+                   _purchases: PurchaseColumns) -> Tuple["go.Figure", Optional[str]]:
+    import plotly.express as px
+    from shopimpact.charts import scatter_points
+
+    points, webgl = scatter_points(_purchases.to_frame(), budget)
+    fig = px.scatter(points, x='price', y='co2_impact', color='type', size='co2_impact',
+                     hover_data=['brand'], size_max=40, render_mode='webgl' if webgl else 'svg')
+    fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)', 
+        plot_bgcolor='rgba(255,255,255,0.4)',
+        xaxis_title="Price (₹)",
+        yaxis_title="CO₂ Impact (kg)",
+        font=dict(color='black')
+    )
+    total = len(_purchases)
+    sampled = f"Showing a random sample of {len(points):,} of {total:,} purchases." if len(points) < total else None
+    return fig, sampled
+
+def chart(build, *settings) -> Tuple["go.Figure", Optional[str]]:
+    """Figure for this session's purchases; uncached while the session's copy matches no stored version."""
+    args = (st.session_state.user_id, st.session_state.data_version, *settings, st.session_state.purchases)
+    if st.session_state.data_version is None:
+        return build.__wrapped__(*args)
+    return build(*args)
 
-# --- DASHBOARD TAB ---
-with tab_dash:
-    col_input, col_stats = st.columns([1, 1.5], gap="large")
+# ==================== MAIN UI ====================
+@st.fragment
+def catalog_picker(label: str, kind: str, key: str) -> None:
+    """
+    Search-as-you-type over the catalog: each pause in typing reruns only
+    this fragment, and the selectbox gets the top matches, never the catalog.
+    """
+    query = st.text_input(label, key=f"{key}_query", type="search", live="200ms",
+                          placeholder=f"Search {len(get_catalog().names(kind)):,} {kind}s…")
+    with profiler.phase("catalog.search"):
+        matches = get_catalog().search(query, kind, CATALOG_TOP_K)
+    if not matches:
+        st.caption(f"No {kind} matches “{query}”.")
+    st.selectbox(label, matches, key=key, label_visibility="collapsed")
+
+# Only the open tab is rendered, and widgets rerun the smallest fragment that
+# shows their effect, so e.g. logging a purchase never builds analytics.
+@st.fragment
+def purchase_panel() -> None:
+    st.markdown("#### 📝 New Purchase")
+    with st.container():
+        st.markdown('<div class="stCard">', unsafe_allow_html=True)
+        # Outside the form: form widgets can't search as you type.
+        catalog_picker("📦 What did you buy?", 'product', "pick_type")
+        catalog_picker("🏷️ Brand", 'brand', "pick_brand")
+        # Ensure unique key for form
+        with st.form("add_item_form_v2", clear_on_submit=True):
+            # CHANGED: Slider instead of number input
+            price = st.slider("💰 Price (₹)", min_value=0, max_value=50000, value=500, step=100)
+            
+            submitted = st.form_submit_button("Add to Tracker", type="primary", width="stretch")
+            
+            if submitted:
+                product_type, brand = st.session_state.get("pick_type"), st.session_state.get("pick_brand")
+                if not product_type or not brand:
+                    st.warning("Please pick a product and a brand.")
+                elif price > 0:
+                    new_badges = add_purchase(product_type, brand, price)
+                    rerun_after_write(f"Added {product_type}!", new_badges)
+                else:
+                    st.warning("Please set a price greater than 0.")
+            if 'notice' in st.session_state:
+                st.success(st.session_state.pop('notice'))
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        with st.expander("📥 Import purchase history (CSV)"):
+            st.caption("Columns: `date` (YYYY-MM-DD or YYYY-MM-DD HH:MM), `type`, `brand`, `price`. "
+                       "Types and brands must match the catalog; CO₂ is calculated for you.")
+            upload = st.file_uploader("CSV file", type="csv", key="import_csv")
+            if upload is not None and st.button("Import", key="import_go"):
+                import_history(upload)
+            errors = st.session_state.pop('import_errors', None)
+            if errors:
+                st.dataframe([{'line': line, 'problem': problem} for line, problem in errors], hide_index=True)
+
+        with st.expander("📤 Export purchase history"):
+            fmt = st.radio("Format", ["CSV", "Parquet"], key="export_format", horizontal=True).lower()
+            picked = st.date_input("Dates", value=(), key="export_range", format="YYYY-MM-DD",
+                                   help="Leave empty to export every purchase.")
+            types = st.multiselect("Categories", PRODUCT_TYPES, key="export_types", placeholder="All categories")
+            start, end = None, None
+            if len(picked) == 2:
+                start, end = picked[0].isoformat(), (picked[1] + timedelta(days=1)).isoformat()
+            mime, ext = EXPORT_FORMATS[fmt]
+            # The file is streamed from storage only when clicked, on Streamlit's download thread.
+            st.download_button("Download", data=export_history(fmt, start, end, types or None),
+                               file_name=f"shopimpact-{st.session_state.user_id}{ext}", mime=mime,
+                               on_click="ignore", key="export_go")
+
+        st.markdown("#### 💡 Quick Eco-Tip")
+        tips = [
+            "Buying used saves ~80% CO₂ vs new!",
+            "Local produce = 5x less transport emissions.",
+            "Repair > Replace.",
+            "Combine deliveries to save fuel."
+        ]
+        st.info(random.choice(tips))
+
+def month_progress() -> None:
+    """This month's spend and CO₂ against the profile's budget and goal, from the running monthly rollup."""
+    profile = st.session_state.user_profile
+    month = st.session_state.aggregates.by_month.get(datetime.now().strftime('%Y-%m'), {})
+    spend, co2 = month.get('spend', 0.0), month.get('co2', 0.0)
+    budget, goal = float(profile['monthlyBudget']), float(profile['co2Goal'])
+    st.progress(min(spend / budget, 1.0) if budget > 0 else 0.0,
+                text=f"💰 This month: ₹{spend:,.0f} of ₹{budget:,.0f} budget")
+    st.progress(min(co2 / goal, 1.0) if goal > 0 else 0.0,
+                text=f"🌍 This month: {co2:.1f} of {goal:,.1f} kg CO₂ goal")
+
+def date_filter() -> Optional[PurchaseColumns]:
+    """The purchases in the picked date range (both ends inclusive), or None when no range is picked."""
+    picked = st.date_input("📅 Filter by date", value=(), key="dashboard_range", format="YYYY-MM-DD",
+                           help="Pick a start and an end date. Clear the field to see all time.")
+    if len(picked) != 2:
+        return None
+    start, end = picked
+    return st.session_state.purchases.between(start, end + timedelta(days=1))
+
+def activity_html(rows: List[Dict]) -> str:
+    """Activity cards for `rows` as one HTML block: one element per rerun, however many rows."""
+    cards = []
+    for row in rows:
+        icon = "🍃" if row['type'] in ECO_FRIENDLY_CATEGORIES else "🛍️"
+        color = "#2e7d32" if row['type'] in ECO_FRIENDLY_CATEGORIES else "#4a5568"
+        cards.append(
+            f"""<div style="padding: 10px; background: rgba(255,255,255,0.7); border-radius: 10px; margin-bottom: 8px; border-left: 4px solid {color}; color: black;">
+                <span style="font-size: 1.2rem;">{icon}</span>
+                <strong>{escape(row['type'])}</strong> ({escape(row['brand'])})
+                <span style="float: right; color: #000; font-weight: bold;">₹{row['price']:,.0f} | {row['co2_impact']:.1f}kg CO₂</span>
+            </div>"""
+        )
+    return "".join(cards)
+
+def log_table_html(rows: List[Dict]) -> str:
+    cells = "".join(
+        f"<tr><td>{row['date']}</td><td>{'🍃 ' if row['type'] in ECO_FRIENDLY_CATEGORIES else ''}{escape(row['type'])}</td>"
+        f"<td>{escape(row['brand'])}</td><td class='num'>₹{row['price']:,.0f}</td>"
+        f"<td class='num'>{row['co2_impact']:.1f}</td></tr>"
+        for row in rows
+    )
+    return (
+        "<table class='purchase-log'><thead><tr><th>Date</th><th>Type</th><th>Brand</th>"
+        f"<th class='num'>Price</th><th class='num'>CO₂ (kg)</th></tr></thead><tbody>{cells}</tbody></table>"
+    )
+
+@st.fragment
+def impact_overview() -> None:
+    st.markdown("#### 🚀 Live Impact Overview")
     
-    with col_input:
-        st.markdown("#### 📝 New Purchase")
-        with st.container():
-            st.markdown('<div class="stCard">', unsafe_allow_html=True)
-            # Ensure unique key for form
-            with st.form("add_item_form_v2", clear_on_submit=True):
-                product_type = st.selectbox("📦 What did you buy?", PRODUCT_TYPES)
-                brand = st.selectbox("🏷️ Brand", ALL_BRANDS)
-                
-                # CHANGED: Slider instead of number input
-                price = st.slider("💰 Price (₹)", min_value=0, max_value=50000, value=500, step=100)
-                
-                submitted = st.form_submit_button("Add to Tracker", type="primary", use_container_width=True)
-                
-                if submitted:
-                    if price > 0:
-                        add_purchase(product_type, brand, price)
-                        st.success(f"Added {product_type}!")
-                    else:
-                        st.warning("Please set a price greater than 0.")
-            st.markdown('</div>', unsafe_allow_html=True)
-
-            st.markdown("#### 💡 Quick Eco-Tip")
-            tips = [
-                "Buying used saves ~80% CO₂ vs new!",
-                "Local produce = 5x less transport emissions.",
-                "Repair > Replace.",
-                "Combine deliveries to save fuel."
-            ]
-            st.info(random.choice(tips))
-
-    with col_stats:
-        st.markdown("#### 🚀 Live Impact Overview")
-        
-        if st.session_state.purchases:
-            df = pd.DataFrame(st.session_state.purchases)
-            total_spend = df['price'].sum()
-            total_co2 = df['co2_impact'].sum()
+    if st.session_state.purchases:
+        month_progress()
+        selected = date_filter()
+        if selected is not None and not selected:
+            st.info("No purchases in this date range.")
+            return
+
+        with profiler.phase("dashboard.metrics"):
+            # A range is a binary-searched view, so its totals cost O(purchases in range).
+            aggs = st.session_state.aggregates if selected is None else selected.aggregates()
+            total_spend = aggs.total_spend
+            total_co2 = aggs.total_co2
+            count = aggs.count
             
             m1, m2, m3 = st.columns(3)
             with m1:
-                st.metric("Total Spent", f"₹{total_spend:,.0f}", delta=f"{len(df)} items")
+                st.metric("Total Spent", f"₹{total_spend:,.0f}", delta=f"{count} items")
             with m2:
                 st.metric("Total CO₂", f"{total_co2:.1f} kg", delta_color="inverse", delta="Low is good!")
             with m3:
-                eco_items = df[df['type'].isin(ECO_FRIENDLY_CATEGORIES)].shape[0]
-                rate = (eco_items/len(df)*100) if len(df) > 0 else 0
-                st.metric("Eco Choices", f"{eco_items}", f"{rate:.0f}% Rate")
-
-            st.markdown("#### 🕰️ Recent Activity")
-            recent = df.tail(5).iloc[::-1]
-            for _, row in recent.iterrows():
-                icon = "🍃" if row['type'] in ECO_FRIENDLY_CATEGORIES else "🛍️"
-                color = "#2e7d32" if row['type'] in ECO_FRIENDLY_CATEGORIES else "#4a5568"
-                st.markdown(
-                    f"""
-                    <div style="padding: 10px; background: rgba(255,255,255,0.7); border-radius: 10px; margin-bottom: 8px; border-left: 4px solid {color}; color: black;">
-                        <span style="font-size: 1.2rem;">{icon}</span> 
-                        <strong>{row['type']}</strong> ({row['brand']}) 
-                        <span style="float: right; color: #000; font-weight: bold;">₹{row['price']:,.0f} | {row['co2_impact']:.1f}kg CO₂</span>
-                    </div>
-                    """, 
-                    unsafe_allow_html=True
-                )
-        else:
-            st.markdown(
-                """
-                <div style="text-align: center; padding: 40px; color: #000;">
-                    <h3>👻 Nothing here yet!</h3>
-                    <p>Log your first purchase to see your impact statistics.</p>
-                </div>
-                """, 
-                unsafe_allow_html=True
-            )
-
-# --- ANALYTICS TAB ---
-with tab_analytics:
-    if st.session_state.purchases:
-        df = pd.DataFrame(st.session_state.purchases)
-        df['date_dt'] = pd.to_datetime(df['date'])
-        
-        row1_col1, row1_col2 = st.columns(2)
-        
-        with row1_col1:
-            st.markdown("### 📅 Spending vs CO₂ Over Time")
-            fig_line = px.line(df, x='date_dt', y=['price', 'co2_impact'], markers=True, 
-                               labels={'value': 'Amount', 'date_dt': 'Date'},
-                               color_discrete_map={'price': '#2ecc71', 'co2_impact': '#e74c3c'})
-            fig_line.update_layout(
-                paper_bgcolor='rgba(0,0,0,0)', 
-                plot_bgcolor='rgba(0,0,0,0)', 
-                legend_title_text='',
-                font=dict(color='black')
-            )
-            st.plotly_chart(fig_line, use_container_width=True)
-
-        with row1_col2:
-            st.markdown("### 🍩 Category Impact Breakdown")
-            fig_pie = px.sunburst(df, path=['type', 'brand'], values='co2_impact', 
-                                  color='co2_impact', color_continuous_scale='RdYlGn_r')
-            fig_pie.update_layout(paper_bgcolor='rgba(0,0,0,0)', font=dict(color='black'))
-            st.plotly_chart(fig_pie, use_container_width=True)
-            
-        st.markdown("### 📉 Efficiency Scatter Plot (Price vs Impact)")
-        st.caption("Identify items that were expensive but low impact (Green zone) vs cheap but high impact (Red zone)")
-        fig_scatter = px.scatter(df, x='price', y='co2_impact', color='type', size='co2_impact',
-                                 hover_data=['brand'], size_max=40)
-        fig_scatter.update_layout(
-            paper_bgcolor='rgba(0,0,0,0)', 
-            plot_bgcolor='rgba(255,255,255,0.4)',
-            xaxis_title="Price (₹)",
-            yaxis_title="CO₂ Impact (kg)",
-            font=dict(color='black')
-        )
-        st.plotly_chart(fig_scatter, use_container_width=True)
-        
+                st.metric("Eco Choices", f"{aggs.eco_count}", f"{aggs.eco_rate:.0f}% Rate")
+
+        st.markdown("#### 🕰️ Recent Activity")
+        with profiler.phase("dashboard.recent"):
+            # The session's own copy: no storage read, so nothing waits on a queued write's flush.
+            shown = st.session_state.purchases if selected is None else selected
+            recent = shown[-5:].to_records()[::-1]
+            st.markdown(activity_html(recent), unsafe_allow_html=True)
     else:
+        st.markdown(
+            """
+            <div style="text-align: center; padding: 40px; color: #000;">
+                <h3>👻 Nothing here yet!</h3>
+                <p>Log your first purchase to see your impact statistics.</p>
+            </div>
+            """, 
+            unsafe_allow_html=True
+        )
+
+LOG_SORTS = {  # label -> (PurchaseColumns sort key, descending)
+    "Newest first": ('date', True),
+    "Oldest first": ('date', False),
+    "Price: high to low": ('price', True),
+    "Price: low to high": ('price', False),
+    "CO₂: high to low": ('co2_impact', True),
+    "CO₂: low to high": ('co2_impact', False),
+}
+LOG_PAGE_SIZES = (25, 50, 100)
+
+def first_log_page() -> None:
+    st.session_state.log_page = 1
+
+@st.fragment
+def purchase_log() -> None:
+    """
+    The full history, one page at a time. Pages are cut from the in-memory
+    columns (O(page size) once a sort order is cached) and sent as one HTML
+    table, so a rerun's payload depends on the page size, not the history.
+    """
+    log = st.expander("📜 Purchase log", key="log_open", on_change="rerun")
+    if not log.open:  # collapsed: nothing is sorted or sent
+        return
+    with log:
+        purchases = st.session_state.purchases
+        c1, c2, c3 = st.columns([2, 1, 1])
+        key, descending = LOG_SORTS[c1.selectbox("Sort", list(LOG_SORTS), key="log_sort", on_change=first_log_page)]
+        size = c2.selectbox("Rows per page", LOG_PAGE_SIZES, key="log_page_size", on_change=first_log_page)
+        pages = max(1, -(-len(purchases) // size))
+        if st.session_state.get('log_page', 1) > pages:  # the history shrank (reset) or pages got bigger
+            st.session_state.log_page = pages
+        number = c3.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, step=1, key="log_page")
+        with profiler.phase("dashboard.log"):
+            rows = purchases.page(number - 1, size, key, descending)
+            st.markdown(log_table_html(rows), unsafe_allow_html=True)
+        first = (number - 1) * size
+        st.caption(f"Purchases {first + 1:,}–{first + len(rows):,} of {len(purchases):,}")
+
+@st.fragment
+def timeseries_chart(point_budget: int) -> None:
+    st.markdown("### 📅 Spending vs CO₂ Over Time")
+    reduction = st.radio("Over budget, show", ["Time buckets", "Representative points (LTTB)"],
+                         key="timeseries_reduction", horizontal=True, label_visibility="collapsed")
+    method = 'lttb' if reduction.startswith("Representative") else 'buckets'
+    with profiler.phase("chart.timeseries"):
+        fig_line, note = chart(timeseries_figure, point_budget, method)
+        st.plotly_chart(fig_line, width="stretch")
+    if note:
+        st.caption(note)
+
+@st.fragment
+def sunburst_chart() -> None:
+    st.markdown("### 🍩 Category Impact Breakdown")
+    with profiler.phase("chart.sunburst"):
+        fig_pie, _ = chart(sunburst_figure)
+        st.plotly_chart(fig_pie, width="stretch")
+
+@st.fragment
+def scatter_chart(point_budget: int) -> None:
+    st.markdown("### 📉 Efficiency Scatter Plot (Price vs Impact)")
+    st.caption("Identify items that were expensive but low impact (Green zone) vs cheap but high impact (Red zone)")
+    with profiler.phase("chart.scatter"):
+        fig_scatter, note = chart(scatter_figure, point_budget)
+        st.plotly_chart(fig_scatter, width="stretch")
+    if note:
+        st.caption(note)
+
+@st.fragment
+def analytics_view() -> None:
+    if not st.session_state.purchases:
         st.info("Log some data to unlock analytics!")
+        return
 
-# --- PROFILE TAB ---
-with tab_profile:
+    from shopimpact.charts import DEFAULT_POINT_BUDGET
+
+    with st.expander("⚙️ Chart settings"):
+        point_budget = st.number_input(
+            "Point budget per chart", min_value=0, step=500, value=int(POINT_BUDGET or DEFAULT_POINT_BUDGET),
+            key="point_budget",
+            help="Larger histories are summarized on the server before plotting. 0 plots every purchase.")
+    
+    row1_col1, row1_col2 = st.columns(2)
+    with row1_col1:
+        timeseries_chart(point_budget)
+    with row1_col2:
+        sunburst_chart()
+    scatter_chart(point_budget)
+
+def profile_view() -> None:
     p_col1, p_col2 = st.columns([1, 2])
     
     with p_col1:
@@ -478,12 +600,12 @@ with tab_profile:
                     'monthlyBudget': new_budget,
                     'co2Goal': new_goal
                 })
-                save_data({'purchases': st.session_state.purchases, 'user_profile': st.session_state.user_profile})
+                save_profile({'name': new_name, 'monthlyBudget': new_budget, 'co2Goal': new_goal})
                 st.success("Updated!")
                 st.rerun()
                 
         if st.button("🗑️ Reset All Data", type="secondary"):
-            st.session_state.purchases = []
+            st.session_state.purchases = PurchaseColumns()
             st.session_state.user_profile['badges'] = []
             save_data(get_default_data())
             st.rerun()
@@ -528,6 +650,80 @@ with tab_profile:
                     unsafe_allow_html=True
                 )
 
+        peer_comparison()
+
+def peer_comparison() -> None:
+    """This month's spend and CO₂ against every other user active this month."""
+    ranking = get_ranking()
+    month = datetime.now().strftime('%Y-%m')
+    st.markdown("### 📈 How You Compare")
+    if not ranking.ready.is_set():
+        st.caption("Gathering everyone's totals…")
+    co2, spend = ranking.rank(st.session_state.user_id, month, 'co2'), ranking.rank(st.session_state.user_id, month, 'spend')
+    if co2 is None:
+        st.info("Log a purchase this month to see how you compare with other users.")
+        return
+    share, others = co2
+    c1, c2 = st.columns(2)
+    c1.metric("Monthly CO₂", f"Lower than {share:.0%}", help=f"Of {others:,} other users with purchases this month")
+    c2.metric("Monthly spend", f"Lower than {spend[0]:.0%}", help=f"Of {others:,} other users with purchases this month")
+    st.caption(f"🌍 Your CO₂ this month is lower than {share:.0%} of {others:,} other users.")
+
+def debug_panel() -> None:
+    with st.sidebar.expander("⏱️ Rerun timings", expanded=True):
+        st.caption("This run")
+        st.dataframe([{'phase': name, 'ms': round(seconds * 1000, 2)} for name, seconds in profiler.current_run()],
+                     hide_index=True, width="stretch")
+        st.caption(f"Rolling percentiles (last {profiler.window} per phase, all sessions)")
+        st.dataframe(
+            [{'phase': name, 'count': row['count'],
+              **{q: round(row[q] * 1000, 2) for q in ('p50', 'p90', 'p99')}}
+             for name, row in profiler.summary().items()],
+            hide_index=True, width="stretch")
+
+celebrate(st.session_state.pop('pending_badges', []))
+
+# HEADER
+col_h1, col_h2 = st.columns([3, 1])
+with col_h1:
+    st.markdown("# 🍃 ShopImpact")
+    st.markdown("### *Your Conscious Shopping Companion*")
+with col_h2:
+    if st.session_state.user_profile['badges']:
+        latest = st.session_state.user_profile['badges'][-1]
+        st.info(f"Latest Badge: {BADGES[latest]['icon']} {BADGES[latest]['name']}")
+    else:
+        st.info("Start shopping to earn badges!")
+
+st.markdown("---")
+profiler.mark("first_paint")  # styles and header are out: what a new visitor sees first
+
+# TABS
+# on_change="rerun" makes the selected tab part of the script state, so closed tabs can be skipped.
+tab_dash, tab_analytics, tab_profile = st.tabs(
+    ["🛍️ Dashboard", "📊 Analytics", "🏆 Profile & Badges"], key="active_tab", on_change="rerun")
+
+# --- DASHBOARD TAB ---
+if tab_dash.open:
+    with tab_dash:
+        col_input, col_stats = st.columns([1, 1.5], gap="large")
+        with col_input:
+            purchase_panel()
+        with col_stats:
+            impact_overview()
+            if st.session_state.purchases:
+                purchase_log()
+
+# --- ANALYTICS TAB ---
+if tab_analytics.open:
+    with tab_analytics:
+        analytics_view()
+
+# --- PROFILE TAB ---
+if tab_profile.open:
+    with tab_profile, profiler.phase("profile"):
+        profile_view()
+
 # FOOTER
 st.markdown("<br><br><br>", unsafe_allow_html=True)
 st.markdown(
@@ -538,3 +734,8 @@ st.markdown(
     """, 
     unsafe_allow_html=True
 )
+
+profiler.finish_run()
+profiler.maybe_dump(METRICS_FILE, METRICS_INTERVAL)
+if show_debug_panel:
+    debug_panel()
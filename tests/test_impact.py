@@ -0,0 +1,81 @@
+import numpy as np
+
+from shopimpact.impact import ImpactAggregates, PRODUCT_TYPES, evaluate_badges, score_batch, score_purchase
+
+# The scoring as the app shipped it before it moved to shopimpact.impact.
+BASELINE_MULTIPLIERS = {
+    'Fast Fashion': 2.5, 'Jeans': 3.2, 'Coat': 4.2, 'Shoes': 3.0,
+    'Electronics': 1.8, 'Smartphone': 2.5, 'Laptop': 3.0, 'Desktop Computer': 3.5,
+    'Meat': 1.5, 'Dairy Products': 0.6, 'Local Groceries': 0.3, 'Organic Vegetables': 0.2,
+    'Sofa': 4.0, 'Bed': 3.5, 'Appliance': 2.0,
+    'Cosmetics': 1.5, 'Perfume': 1.5,
+    'Books (New)': 0.5, 'Books (Used)': 0.05, 'E-book': 0.02,
+    'Bicycle': 5.0, 'Car Parts': 2.0,
+    'Second-Hand Item': 0.1, 'Thrifted Clothing': 0.08, 'Used Electronics': 0.15,
+    'Digital Download': 0.02, 'Service': 0.0
+}
+BASELINE_ECO = [
+    'Second-Hand Item', 'Local Groceries', 'Books (Used)', 'Thrifted Clothing',
+    'Used Electronics', 'Vintage Furniture', 'Organic Vegetables', 'Organic Fruits',
+    'Refurbished Tech', 'Bicycle', 'Vegan Leather', 'Digital Download'
+]
+
+def baseline_multiplier(product_type):
+    if product_type in BASELINE_MULTIPLIERS:
+        return BASELINE_MULTIPLIERS[product_type]
+    elif 'Used' in product_type or 'Second-Hand' in product_type or 'Thrift' in product_type:
+        return 0.1
+    elif 'Leather' in product_type:
+        return 3.5
+    elif 'Plastic' in product_type:
+        return 2.0
+    else:
+        return 1.0
+
+def baseline_score(product_type, price):
+    co2_impact = price * baseline_multiplier(product_type) / 100
+    if product_type in BASELINE_ECO:
+        co2_impact *= 0.5
+    return float(co2_impact)
+
+# Not in the catalog: they take the Used / Second-Hand / Thrift, Leather, Plastic and default branches.
+UNKNOWN_TYPES = ['Used Sofa', 'Second-Hand Bike Rack', 'Thrift Store Lamp', 'Leather Bag', 'Vegan Leather',
+                 'Plastic Chair', 'Mystery Gadget']
+
+def test_scores_match_baseline_formula_bit_for_bit():
+    rng = np.random.default_rng(7)
+    prices = np.concatenate([[0.01, 1, 99.99, 100, 1234.5, 45000, 1e7],
+                             rng.uniform(0, 100_000, 300), rng.integers(1, 50_000, 100)]).tolist()
+    types = list(PRODUCT_TYPES) + UNKNOWN_TYPES
+    pairs = [(t, p) for t in types for p in prices]
+    expected = [baseline_score(t, p).hex() for t, p in pairs]
+
+    assert [score_purchase(t, p).hex() for t, p in pairs] == expected
+    batch = score_batch([t for t, _ in pairs], [p for _, p in pairs])
+    assert [float(x).hex() for x in batch] == expected
+
+def purchases(*rows):
+    return [{'date': '2024-01-01 12:00', 'type': t, 'brand': 'Dell', 'price': price, 'co2_impact': co2}
+            for t, price, co2 in rows]
+
+def evaluate(rows, owned=()):
+    history = purchases(*rows)
+    return evaluate_badges(ImpactAggregates.from_purchases(history), history[-1], owned)
+
+def test_several_badges_in_one_pass():
+    assert evaluate([('Laptop', 45000.0, 0.5)]) == ['first_step', 'low_carbon', 'big_saver']
+
+def test_eco_warrior_boundary():
+    just_under = [('Laptop', 100.0, 9.99)] * 4 + [('Laptop', 100.0, 10.0)]  # 49.96 kg over 5 items
+    at_limit = [('Laptop', 100.0, 10.0)] * 5                                 # 50 kg
+    assert 'eco_warrior' in evaluate(just_under)
+    assert 'eco_warrior' not in evaluate(at_limit)
+    assert 'eco_warrior' not in evaluate(just_under[:4])  # under 50 kg, but only 4 items
+
+def test_owned_badges_are_not_awarded_again():
+    rows = [('Second-Hand Item', 20000.0, 0.1)] * 5
+    earned = evaluate(rows)
+    assert earned == ['first_step', 'thrift_king', 'low_carbon', 'big_saver', 'eco_warrior', 'consistent']
+    assert evaluate(rows, owned=earned) == []
+    assert evaluate(rows, owned=['first_step', 'big_saver']) == ['thrift_king', 'low_carbon', 'eco_warrior',
+                                                                  'consistent']
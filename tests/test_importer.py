@@ -0,0 +1,45 @@
+import io
+
+from shopimpact.importer import import_purchases_csv
+from shopimpact.storage import JournaledJsonStore
+
+def test_rows_with_utc_offsets_are_rejected_per_line(tmp_path):
+    store = JournaledJsonStore(tmp_path / 'u.json', fsync=False)
+    csv = io.StringIO(
+        "date,type,brand,price\n"
+        "2024-01-01 10:00,Laptop,Dell,100\n"
+        "2024-01-02T10:00+05:30,Laptop,Dell,100\n"
+        "2024-01-03T10:00Z,Laptop,Dell,100\n"
+        "2024-01-04,Laptop,Dell,100\n"
+    )
+    try:
+        report = import_purchases_csv(csv, store)
+        assert report.imported == 2
+        assert [line for line, _ in report.errors] == [3, 4]
+        assert all('timezone' in message for _, message in report.errors)
+        assert [p['date'] for p in store.load()['purchases']] == ['2024-01-01 10:00', '2024-01-04 00:00']
+    finally:
+        store.close()
+
+def test_offset_only_file_imports_nothing(tmp_path):
+    store = JournaledJsonStore(tmp_path / 'u.json', fsync=False)
+    try:
+        report = import_purchases_csv(io.StringIO("date,type,brand,price\n2024-01-02T10:00+05:30,Laptop,Dell,100\n"), store)
+        assert (report.imported, report.rejected) == (0, 1)
+        assert store.load()['purchases'] == []
+    finally:
+        store.close()
+
+def test_badges_do_not_depend_on_row_order(tmp_path):
+    store = JournaledJsonStore(tmp_path / 'u.json', fsync=False)
+    csv = io.StringIO(
+        "date,type,brand,price\n"
+        "2024-01-01,Laptop,Dell,45000\n"
+        "2024-01-02,E-book,Dell,10\n"
+        "2024-01-03,Fast Fashion,Zara,1000\n"
+    )
+    try:
+        report = import_purchases_csv(csv, store, chunk_size=2)  # the extremes sit in another chunk than the last row
+        assert report.badges == ['first_step', 'low_carbon', 'big_saver']
+    finally:
+        store.close()
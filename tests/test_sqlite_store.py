@@ -0,0 +1,93 @@
+import pandas as pd
+import pytest
+
+from shopimpact.storage import JournaledJsonStore, SqliteStore, migrate_json_to_sqlite
+
+def purchase(i: int) -> dict:
+    return {'date': f'2024-01-{i % 28 + 1:02d} 12:00', 'type': 'Laptop', 'brand': 'Dell',
+            'price': float(i + 1), 'co2_impact': 1.0}
+
+@pytest.fixture
+def store(tmp_path):
+    store = SqliteStore(tmp_path / 'x.db')
+    yield store
+    store.close()
+
+def test_round_trip_and_version_counting(store):
+    assert store.version('u') == 0
+    assert store.append_purchase(purchase(0), 'u') == 1
+    assert store.append_purchase(purchase(1), 'u', badges=['first_step']) == 2
+    assert store.update_profile({'name': 'Asha', 'monthly_budget': 9000}, 'u') == 3
+    assert store.update_profile({'badges': ['first_step', 'big_saver']}, 'u') == 4
+
+    data = store.load('u')
+    assert data['purchases'] == [purchase(0), purchase(1)]
+    profile = data['user_profile']
+    assert (profile['name'], profile['monthly_budget']) == ('Asha', 9000)
+    assert profile['badges'] == ['first_step', 'big_saver']  # added once each, in award order
+    assert store.summary('u')['count'] == 2
+    assert store.version('u') == 4
+    assert store.users() == ['u']
+    assert store.load('v')['purchases'] == [] and store.version('v') == 0
+
+def test_apply_batch_save_supersedes_earlier_ops(store):
+    store.append_purchase(purchase(0), 'u')
+    ops = [
+        ('add', purchase(1), ['first_step']),
+        ('save', {'purchases': [purchase(5)], 'user_profile': {'name': 'Ravi', 'badges': []}}),
+        ('add', purchase(6), []),
+        ('profile', {'co2_goal': 40}),
+    ]
+    assert store.apply_batch(ops, 'u') == 1 + len(ops)  # every op counts as one write
+    data = store.load('u')
+    assert data['purchases'] == [purchase(5), purchase(6)]
+    assert (data['user_profile']['name'], data['user_profile']['co2_goal']) == ('Ravi', 40)
+    assert data['user_profile']['badges'] == []
+    assert store.summary('u')['count'] == 2
+
+def test_bulk_append_rolls_back_on_exception(store):
+    store.append_purchase(purchase(0), 'u')
+    with pytest.raises(RuntimeError):
+        with store.bulk_append('u') as batch:
+            batch.append(pd.DataFrame([purchase(i) for i in range(1, 11)]))
+            batch.badges = ['big_saver']
+            raise RuntimeError("import failed half-way")
+    assert store.load('u')['purchases'] == [purchase(0)]
+    assert store.profile('u')['badges'] == []
+    assert store.summary('u')['count'] == 1
+    assert store.version('u') == 1
+
+    with store.bulk_append('u') as batch:  # nothing left over from the failed import
+        batch.append(pd.DataFrame([purchase(1)]))
+    assert store.load('u')['purchases'] == [purchase(0), purchase(1)]
+
+def test_migrate_v3_file_with_journal(tmp_path, store):
+    legacy = JournaledJsonStore(tmp_path / 'shopimpact_data_v3.json', compact_every=10_000, fsync=False)
+    legacy.save({'purchases': [purchase(0)], 'user_profile': {'name': 'Asha', 'badges': ['first_step']}})
+    legacy.append_purchase(purchase(1), badges=['big_saver'])  # only in the journal
+    legacy.update_profile({'co2_goal': 30})
+    legacy.close()
+    assert legacy.journal_path.stat().st_size > 0
+
+    assert migrate_json_to_sqlite(legacy.snapshot_path, store) == 2
+    data = store.load()
+    assert data['purchases'] == [purchase(0), purchase(1)]
+    assert (data['user_profile']['name'], data['user_profile']['co2_goal']) == ('Asha', 30)
+    assert data['user_profile']['badges'] == ['first_step', 'big_saver']
+    assert store.summary()['count'] == 2
+
+def test_bulk_append_does_not_block_other_writers(tmp_path):
+    importer, other = SqliteStore(tmp_path / 'x.db'), SqliteStore(tmp_path / 'x.db')
+    try:
+        importer.append_purchase(purchase(0), 'u')
+        with importer.bulk_append('u') as batch:
+            batch.append(pd.DataFrame([purchase(i) for i in range(1, 101)]))
+            other._conn().execute('PRAGMA busy_timeout = 100')  # fail fast if the import held the write lock
+            assert other.append_purchase(purchase(0), 'v') == 1
+            batch.append(pd.DataFrame([purchase(i) for i in range(101, 201)]))
+        assert batch.version == 2
+        assert [p['price'] for p in importer.load('u')['purchases']] == [float(i + 1) for i in range(201)]
+        assert importer.summary('u')['count'] == 201
+    finally:
+        importer.close()
+        other.close()
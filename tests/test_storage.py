@@ -0,0 +1,43 @@
+import threading
+import time
+
+from shopimpact.storage import JournaledJsonStore
+
+def purchase(i: int) -> dict:
+    return {'date': f'2024-01-01 12:{i % 60:02d}', 'type': 'Laptop', 'brand': 'Dell',
+            'price': float(i + 1), 'co2_impact': 1.0}
+
+def test_load_during_compaction_sees_every_record(tmp_path, monkeypatch):
+    store = JournaledJsonStore(tmp_path / 'u.json', compact_every=10_000, fsync=False)
+    for i in range(50):
+        store.append_purchase(purchase(i))
+
+    rotated, loader_read = threading.Event(), threading.Event()
+    read_snapshot = store._read_snapshot
+
+    def paused_read_snapshot():
+        result = read_snapshot()
+        if threading.current_thread().name == 'compactor':
+            # Journal already rotated to .compacting: let a load start now.
+            rotated.set()
+            loader_read.wait(2)
+        elif threading.current_thread().name == 'loader':
+            # Old snapshot read; give the compactor time to swap files under us.
+            loader_read.set()
+            time.sleep(0.3)
+        return result
+
+    monkeypatch.setattr(store, '_read_snapshot', paused_read_snapshot)
+    result = {}
+    compactor = threading.Thread(target=store.compact, name='compactor')
+    loader = threading.Thread(target=lambda: result.update(store.load()), name='loader')
+    compactor.start()
+    assert rotated.wait(2)
+    loader.start()
+    loader.join(5)
+    compactor.join(5)
+
+    assert len(result['purchases']) == 50
+    assert result['aggregates']['count'] == 50
+    assert len(store.load()['purchases']) == 50
+    assert not store.compacting_path.exists()
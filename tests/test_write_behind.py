@@ -0,0 +1,38 @@
+import errno
+
+from shopimpact.storage import JournaledJsonStore
+from shopimpact.write_behind import WriteBehindStore
+
+PURCHASE = {'date': '2024-01-01 12:00', 'type': 'Laptop', 'brand': 'Dell', 'price': 100.0, 'co2_impact': 3.0}
+
+def test_failed_flush_is_reported_not_raised_from_reads(tmp_path, monkeypatch):
+    backend = JournaledJsonStore(tmp_path / 'u.json', fsync=False)
+    store = WriteBehindStore(backend, debounce=60)
+    try:
+        def full_disk(ops, user_id='default'):
+            raise OSError(errno.ENOSPC, 'No space left on device')
+
+        monkeypatch.setattr(backend, 'apply_batch', full_disk)
+        assert store.append_purchase(PURCHASE) == 1
+        assert store.load()['purchases'] == []  # storage doesn't have it yet, and reading doesn't raise
+        assert 'No space left' in store.failure()
+        assert store.version() == 1  # still queued
+
+        monkeypatch.undo()
+        store.flush()
+        assert store.failure() is None
+        assert len(backend.load()['purchases']) == 1
+    finally:
+        store.close()
+
+def test_write_from_another_process_is_logged(tmp_path, caplog):
+    store = WriteBehindStore(JournaledJsonStore(tmp_path / 'u.json', fsync=False), debounce=60)
+    other = JournaledJsonStore(tmp_path / 'u.json', fsync=False)
+    try:
+        assert store.append_purchase(PURCHASE) == 1
+        assert other.append_purchase(PURCHASE) == 1  # the same version, for different data
+        store.flush()
+        assert 'single-process only' in caplog.text
+    finally:
+        other.close()
+        store.close()